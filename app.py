@@ -7,15 +7,23 @@ Main application entry point
 """
 
 import os
+import asyncio
 import logging
-from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, ConversationHandler, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ConversationHandler, CallbackQueryHandler
 from modules.bot_handler import (
     start, handle_access_code, 
     collect_top_five_values, collect_next_five_values, 
     collect_age, collect_country, collect_occupation,
-    review_inputs, confirm_inputs, generate_report, cancel
+    review_inputs, confirm_inputs, cancel,
+    resume_unfinished_reports, maintain_report_jobs, release_report_jobs
 )
-from modules.database import init_db
+from modules.database import init_db, release_access_code_leases, flush_pending_writes
+from modules.report_queue import report_queue
+from modules.report_generator import preload_assets
+from modules.pdf_renderer import get_pdf_renderer
+from modules.utils import configure_blocking_io
+from modules.runtime import ChatOrderedUpdateProcessor, PoolMonitor
+from modules import metrics
 from config import Config
 
 # Enable logging
@@ -29,28 +37,85 @@ logger = logging.getLogger(__name__)
     ACCESS_CODE, 
     TOP_FIVE_VALUES, NEXT_FIVE_VALUES, 
     AGE, COUNTRY, OCCUPATION, 
-    REVIEW, GENERATING_REPORT
-) = range(8)
+    REVIEW
+) = range(7)
+
+async def post_init(application):
+    """Prepare the event loop and pick up reports that were interrupted by a restart"""
+    configure_blocking_io(Config.BLOCKING_IO_THREADS)
+    await resume_unfinished_reports(application.bot)
+    monitor = PoolMonitor(application, Config.POOL_STATS_INTERVAL)
+    application.bot_data['pool_monitor'] = monitor
+    monitor.start()
+    application.bot_data['job_maintenance'] = asyncio.get_running_loop().create_task(
+        maintain_report_jobs(application.bot), name="report-job-leases"
+    )
+
+async def post_stop(application):
+    """
+    Give running reports a little time to finish, then hand everything else back
+    
+    Runs once updates have stopped but while the bot can still send, so
+    reports finishing in the grace period are delivered. Reports that have
+    not started (or do not finish in time) are cancelled and their jobs
+    released, so another instance or the next start resumes them.
+    """
+    monitor = application.bot_data.get('pool_monitor')
+    if monitor is not None:
+        await monitor.stop()
+    # Stop taking over jobs first, so nothing new is queued during the drain
+    maintenance = application.bot_data.get('job_maintenance')
+    if maintenance is not None:
+        maintenance.cancel()
+        try:
+            await maintenance
+        except asyncio.CancelledError:
+            pass
+    await report_queue.shutdown(timeout=Config.REPORT_SHUTDOWN_TIMEOUT)
+    await asyncio.to_thread(release_report_jobs)
+
+async def post_shutdown(application):
+    """Return leased access code uses, commit queued writes and stop the PDF workers"""
+    await asyncio.to_thread(release_access_code_leases)
+    await asyncio.to_thread(flush_pending_writes)
+    get_pdf_renderer().shutdown()
+    metrics.log_snapshot()
 
 def main():
     """Start the bot."""
-    # Create the Application
-    updater = Updater(Config.TELEGRAM_TOKEN)
-    application = updater.dispatcher
+    # Create the Application. Conversation steps run concurrently (in order per
+    # chat) with a bounded backlog; reports run separately in the report queue.
+    update_processor = ChatOrderedUpdateProcessor(
+        Config.HANDLER_CONCURRENCY,
+        max_per_chat=Config.HANDLER_MAX_PER_CHAT
+    )
+    application = (
+        Application.builder()
+        .token(Config.TELEGRAM_TOKEN)
+        .concurrent_updates(update_processor)
+        .update_queue(update_processor.create_update_queue(Config.UPDATE_QUEUE_MAX_SIZE))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Initialize database
     init_db()
 
+    # Encode the report images, load the template and start PDF workers up front
+    preload_assets()
+
     # Define the conversation handler
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
-            ACCESS_CODE: [MessageHandler(Filters.text & ~Filters.command, handle_access_code)],
-            TOP_FIVE_VALUES: [MessageHandler(Filters.text & ~Filters.command, collect_top_five_values)],
-            NEXT_FIVE_VALUES: [MessageHandler(Filters.text & ~Filters.command, collect_next_five_values)],
-            AGE: [MessageHandler(Filters.text & ~Filters.command, collect_age)],
-            COUNTRY: [MessageHandler(Filters.text & ~Filters.command, collect_country)],
-            OCCUPATION: [MessageHandler(Filters.text & ~Filters.command, collect_occupation)],
+            ACCESS_CODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_access_code)],
+            TOP_FIVE_VALUES: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_top_five_values)],
+            NEXT_FIVE_VALUES: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_next_five_values)],
+            AGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_age)],
+            COUNTRY: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_country)],
+            OCCUPATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, collect_occupation)],
             REVIEW: [
                 CallbackQueryHandler(collect_top_five_values, pattern='^edit_top_five$'),
                 CallbackQueryHandler(collect_next_five_values, pattern='^edit_next_five$'),
@@ -59,7 +124,6 @@ def main():
                 CallbackQueryHandler(collect_occupation, pattern='^edit_occupation$'),
                 CallbackQueryHandler(confirm_inputs, pattern='^confirm$')
             ],
-            GENERATING_REPORT: [MessageHandler(Filters.text & ~Filters.command, generate_report)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
         name="values_report_conversation",
@@ -71,16 +135,15 @@ def main():
 
     # Start the Bot
     if Config.WEBHOOK_URL:
-        updater.start_webhook(
+        application.run_webhook(
             listen="0.0.0.0",
             port=int(os.environ.get("PORT", 5000)),
             url_path=Config.TELEGRAM_TOKEN,
-            webhook_url=f"{Config.WEBHOOK_URL}/{Config.TELEGRAM_TOKEN}"
+            webhook_url=f"{Config.WEBHOOK_URL}/{Config.TELEGRAM_TOKEN}",
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS
         )
-        updater.idle()
     else:
-        updater.start_polling()
-        updater.idle()
+        application.run_polling()
 
 
 if __name__ == '__main__':
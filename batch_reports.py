@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Batch report generation for workshop cohorts
+
+Generates reports for a list of participants without going through Telegram.
+Input is a CSV or JSONL file with the same fields the bot collects:
+top_values, next_values, age, country and occupation, plus an optional id
+or name used in the output file name. In CSV files the value lists are
+written as text (e.g. "Family, Honesty, Curiosity, Resilience, Creativity")
+and parsed the same way as chat messages.
+
+Reports are generated concurrently on one event loop and written to the
+output directory. Generated sections are checkpointed, so an interrupted or
+partly failed run can simply be started again: finished reports are skipped
+and failed ones reuse the sections that did succeed.
+
+Usage:
+    python batch_reports.py participants.csv --output-dir reports --format html --concurrency 8
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+from config import Config
+from modules.utils import parse_values, configure_blocking_io
+from modules.value_catalog import resolve_profile
+from modules.job_store import SQLiteJobStore, JOB_GENERATING, JOB_DELIVERED, JOB_FAILED
+from modules.llm_integration import generate_all_sections, FAILED_SECTION_TEXT
+from modules.report_generator import generate_report, preload_assets
+from modules.pdf_renderer import get_pdf_renderer
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = '.batch_jobs.sqlite3'
+
+def read_participants(path):
+    """
+    Read participant profiles from a CSV or JSONL file
+
+    Args:
+        path (str): Input file; JSONL if it ends in .jsonl or .json, CSV otherwise
+
+    Returns:
+        list: (participant_id, user_data) tuples in file order
+
+    Raises:
+        ValueError: If two rows end up with the same participant ID or
+                    report file name (IDs fall back to the row number)
+    """
+    if path.endswith(('.jsonl', '.json')):
+        with open(path, encoding='utf-8') as input_file:
+            rows = [json.loads(line) for line in input_file if line.strip()]
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as input_file:
+            rows = list(csv.DictReader(input_file))
+
+    participants = []
+    rows_by_name = {}
+    for index, row in enumerate(rows, start=1):
+        row = {key.strip().lower(): value for key, value in row.items() if key}
+        user_data = {}
+        for field in ('top_values', 'next_values'):
+            values = row.get(field) or []
+            user_data[field] = parse_values(values) if isinstance(values, str) else list(values)
+        for field in ('age', 'country', 'occupation'):
+            value = row.get(field)
+            user_data[field] = value.strip() if isinstance(value, str) else value
+        if isinstance(user_data['age'], str) and user_data['age'].isdigit():
+            user_data['age'] = int(user_data['age'])
+
+        participant_id = str(row.get('id') or row.get('name') or row.get('email') or index)
+        participants.append((participant_id, user_data))
+        # IDs key the checkpoints and name the output files, so both must be unique
+        rows_by_name.setdefault(safe_file_name(participant_id).lower(), []).append((index, participant_id))
+
+    duplicates = [rows for rows in rows_by_name.values() if len(rows) > 1]
+    if duplicates:
+        details = '; '.join(
+            ', '.join(f"row {index} ('{participant_id}')" for index, participant_id in rows)
+            for rows in duplicates
+        )
+        raise ValueError(f"Participant IDs must be unique; these rows clash: {details}")
+    return participants
+
+def safe_file_name(participant_id):
+    """Turn a participant ID into a safe file name component"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', participant_id).strip('._') or 'participant'
+
+class BatchRunner:
+    """Generates reports for many participants, a bounded number at a time, on one event loop"""
+
+    def __init__(self, output_dir, output_format='html', concurrency=4):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.concurrency = concurrency
+        self.store = SQLiteJobStore(os.path.join(output_dir, CHECKPOINT_FILE))
+        self.completed = 0
+        self.failed = 0
+
+    def output_path(self, participant_id):
+        """Path of the report file for a participant"""
+        return os.path.join(
+            self.output_dir,
+            f"Values_Report_{safe_file_name(participant_id)}.{self.output_format}"
+        )
+
+    async def generate(self, participant_id, user_data):
+        """
+        Generate and write one participant's report
+
+        Returns:
+            tuple: (success, message)
+        """
+        job_id = f"batch-{participant_id}"
+        if len(user_data['top_values']) < 5:
+            return False, "fewer than 5 top values"
+
+        job = await asyncio.to_thread(self.store.get_job, job_id)
+        if job is None:
+            user_data = dict(user_data, value_profile=resolve_profile(user_data))
+            await asyncio.to_thread(self.store.create_job, job_id, None, None, user_data)
+            job = await asyncio.to_thread(self.store.get_job, job_id)
+        await asyncio.to_thread(self.store.set_state, job_id, JOB_GENERATING)
+
+        async def on_section_complete(title, content, prompt):
+            await asyncio.to_thread(self.store.save_section, job_id, title, content, prompt)
+
+        sections_content, _ = await generate_all_sections(
+            job['user_data'],
+            completed_sections=job['sections'],
+            on_section_complete=on_section_complete
+        )
+        failed_sections = [title for title, content in sections_content.items() if content == FAILED_SECTION_TEXT]
+        if failed_sections:
+            await asyncio.to_thread(self.store.set_state, job_id, JOB_FAILED)
+            return False, f"{len(failed_sections)} section(s) failed; rerun to retry them"
+
+        success, report = await asyncio.to_thread(
+            generate_report, job['user_data'], sections_content, self.output_format
+        )
+        if not success:
+            await asyncio.to_thread(self.store.set_state, job_id, JOB_FAILED)
+            return False, report
+
+        path = self.output_path(participant_id)
+        await asyncio.to_thread(self._write_report, report, path)
+        await asyncio.to_thread(self.store.set_state, job_id, JOB_DELIVERED)
+        return True, path
+
+    def _write_report(self, report, path):
+        """Write a report, under a temporary name first so a partial file is never mistaken for a finished one"""
+        with report, open(f"{path}.part", 'wb') as output_file:
+            output_file.write(report.read())
+        os.replace(f"{path}.part", path)
+
+    async def run(self, participants, resume=True):
+        """
+        Generate reports for all participants, printing progress as they finish
+
+        Returns:
+            dict: Run statistics
+        """
+        pending = [
+            (participant_id, user_data) for participant_id, user_data in participants
+            if not (resume and os.path.exists(self.output_path(participant_id)))
+        ]
+        skipped = len(participants) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} participant(s) with existing reports")
+
+        configure_blocking_io(Config.BLOCKING_IO_THREADS)
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(participant_id, user_data):
+            async with slots:
+                success, message, seconds = await self._generate_timed(participant_id, user_data)
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+            status = "ok" if success else f"FAILED: {message}"
+            print(f"[{self.completed + self.failed}/{len(pending)}] {participant_id}: {status} ({seconds:.1f}s)")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_one(participant_id, user_data) for participant_id, user_data in pending))
+        elapsed = time.perf_counter() - start
+
+        return {
+            'total': len(participants),
+            'skipped': skipped,
+            'completed': self.completed,
+            'failed': self.failed,
+            'elapsed': elapsed,
+            'reports_per_minute': self.completed / elapsed * 60 if elapsed else 0.0
+        }
+
+    async def _generate_timed(self, participant_id, user_data):
+        """Run generate(), turning exceptions into failures and timing it"""
+        start = time.perf_counter()
+        try:
+            success, message = await self.generate(participant_id, user_data)
+        except Exception as e:
+            logger.error(f"Error generating report for {participant_id}: {e}", exc_info=True)
+            success, message = False, str(e)
+        return success, message, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate values reports for a cohort of participants")
+    parser.add_argument('input', help="CSV or JSONL file of participant profiles")
+    parser.add_argument('--output-dir', default='reports', help="Directory reports are written to")
+    parser.add_argument('--format', choices=['html', 'pdf'], default=Config.REPORT_OUTPUT_FORMAT)
+    parser.add_argument('--concurrency', type=int, default=Config.REPORT_WORKERS,
+                        help="Reports generated at the same time")
+    parser.add_argument('--no-resume', action='store_true', help="Regenerate reports that already exist")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.WARNING
+    )
+
+    try:
+        participants = read_participants(args.input)
+    except ValueError as e:
+        print(e)
+        return 1
+    if not participants:
+        print("No participants found")
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    Config.REPORT_OUTPUT_FORMAT = args.format
+    preload_assets()
+
+    runner = BatchRunner(args.output_dir, args.format, max(1, args.concurrency))
+    try:
+        stats = asyncio.run(runner.run(participants, resume=not args.no_resume))
+    finally:
+        if args.format == 'pdf':
+            get_pdf_renderer().shutdown()
+
+    counters = metrics.snapshot()['counters']
+    print(
+        f"\nDone in {stats['elapsed']:.1f}s: {stats['completed']} generated, "
+        f"{stats['failed']} failed, {stats['skipped']} skipped "
+        f"({stats['reports_per_minute']:.1f} reports/min)"
+    )
+    print(
+        f"LLM retries: {counters.get('llm_scheduler.retries', 0)}, "
+        f"cache hits: {counters.get('llm_cache.memory_hits', 0) + counters.get('llm_cache.disk_hits', 0)}"
+    )
+    return 1 if stats['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,15 @@
 # Exit on error
 set -e
 
-echo "Installing wkhtmltopdf dependencies..."
+echo "Installing wkhtmltopdf and WeasyPrint dependencies..."
 apt-get update
 apt-get install -y --no-install-recommends \
     fontconfig \
     libfreetype6 \
+    libharfbuzz0b \
     libjpeg62-turbo \
+    libpango-1.0-0 \
+    libpangoft2-1.0-0 \
     libpng16-16 \
     libx11-6 \
     libxcb1 \
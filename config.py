@@ -25,11 +25,95 @@ class Config:
     
     # Google Gemini API
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-lite")
+    GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")  # e.g. http://localhost:8089 for a local fake server
+    GEMINI_GENERATION_CONFIG = {
+        "temperature": float(os.getenv("GEMINI_TEMPERATURE", "1.0")),
+        "max_output_tokens": int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "8192")),
+    }
+    
+    # Section generation settings
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # Sections generated in parallel per report
+    LLM_SECTION_TIMEOUT = float(os.getenv("LLM_SECTION_TIMEOUT", "90"))  # Seconds before an attempt at a section is given up on
+    LLM_SECTION_DEADLINE = float(os.getenv("LLM_SECTION_DEADLINE", "300"))  # Seconds a section may take across all attempts and retries
+    
+    # LLM call scheduling (shared by all reports in progress)
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "240"))
+    LLM_BURST = int(os.getenv("LLM_BURST", "20"))  # Requests allowed at once before rate limiting applies
+    LLM_GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", "16"))  # Requests in flight across all reports
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))  # Seconds
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))  # Seconds
+    LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() in ("1", "true", "yes")  # Stream sections for live previews
+    
+    # Progress updates sent to the user while a report is generated
+    PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "2.0"))  # Minimum seconds between preview edits
+    PROGRESS_PREVIEW_CHARS = int(os.getenv("PROGRESS_PREVIEW_CHARS", "400"))
+    
+    # Write-behind persistence of users, reports and sessions to Firebase
+    WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+    WRITE_BEHIND_JOURNAL_PATH = os.getenv("WRITE_BEHIND_JOURNAL_PATH", os.path.join("data", "write_journal.jsonl"))
+    WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))  # Writes queued before callers wait
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))  # Writes per batch (at most 500)
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "2.0"))  # Seconds a write may wait
+    
+    # Access code redemption settings
+    ACCESS_CODE_LEASE_SIZE = int(os.getenv("ACCESS_CODE_LEASE_SIZE", "0"))  # Uses claimed per Firestore transaction (0 for one at a time)
+    ACCESS_CODE_MAX_ATTEMPTS = int(os.getenv("ACCESS_CODE_MAX_ATTEMPTS", "10"))  # Transaction attempts under contention
+    
+    # Access code attempt screening
+    ACCESS_CODE_USER_BURST = int(os.getenv("ACCESS_CODE_USER_BURST", "5"))  # Attempts a user may make at once
+    ACCESS_CODE_USER_PER_MINUTE = float(os.getenv("ACCESS_CODE_USER_PER_MINUTE", "1"))  # Attempts a user regains per minute
+    ACCESS_CODE_GLOBAL_BURST = int(os.getenv("ACCESS_CODE_GLOBAL_BURST", "300"))  # Database lookups allowed at once
+    ACCESS_CODE_GLOBAL_PER_MINUTE = float(os.getenv("ACCESS_CODE_GLOBAL_PER_MINUTE", "600"))  # Sustained database lookups
+    ACCESS_CODE_NEGATIVE_TTL = float(os.getenv("ACCESS_CODE_NEGATIVE_TTL", "120"))  # Seconds a rejected code is remembered
+    ACCESS_CODE_PREFILTER_REFRESH = float(os.getenv("ACCESS_CODE_PREFILTER_REFRESH", "300"))  # Seconds (0 disables the prefilter)
+    
+    # Update handling settings (conversation steps; reports use the report queue below)
+    HANDLER_CONCURRENCY = int(os.getenv("HANDLER_CONCURRENCY", "64"))  # Updates handled at the same time
+    HANDLER_MAX_PER_CHAT = int(os.getenv("HANDLER_MAX_PER_CHAT", "10"))  # Updates one chat may have waiting before more are dropped
+    UPDATE_QUEUE_MAX_SIZE = int(os.getenv("UPDATE_QUEUE_MAX_SIZE", "1000"))  # Updates waiting for a handler (0 for no limit)
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # Connections Telegram may open (1-100)
+    POOL_STATS_INTERVAL = float(os.getenv("POOL_STATS_INTERVAL", "60"))  # Seconds between utilization logs (0 to disable)
+    
+    # Report job queue settings
+    REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))  # Reports generated at the same time
+    REPORT_QUEUE_MAX_PENDING = int(os.getenv("REPORT_QUEUE_MAX_PENDING", "200"))  # Reports allowed to wait for a worker
+    REPORT_SHUTDOWN_TIMEOUT = float(os.getenv("REPORT_SHUTDOWN_TIMEOUT", "30"))  # Seconds running reports get to finish on shutdown
+    BLOCKING_IO_THREADS = int(os.getenv("BLOCKING_IO_THREADS", "32"))  # Threads for storage and other blocking calls
+    JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "auto")  # auto, firestore or sqlite
+    JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("data", "report_jobs.sqlite3"))
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))  # Unrenewed jobs can be taken over by another instance
+    
+    # LLM response cache settings
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite3"))  # Empty for memory only
+    LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+    LLM_CACHE_DISK_ENTRIES = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "10000"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
     
     # PDF Generation settings
     PDF_FONT = "Poppins"
     PDF_PRIMARY_COLOR = "#333333"  # Dark grey
     PDF_SECONDARY_COLOR = "#FFFFFF"  # White
+    REPORT_OUTPUT_FORMAT = os.getenv("REPORT_OUTPUT_FORMAT", "html").lower()  # html or pdf
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))  # Rendering processes
+    PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))  # Seconds per report
+    PDF_MEMORY_LIMIT_MB = int(os.getenv("PDF_MEMORY_LIMIT_MB", "1024"))  # Per worker; 0 for no limit
+    
+    # Embedded report assets
+    ASSET_RECOMPRESS = os.getenv("ASSET_RECOMPRESS", "false").lower() in ("1", "true", "yes")  # Losslessly shrink PNGs once at load
+    REPORT_IMAGE_FORMAT = os.getenv("REPORT_IMAGE_FORMAT", "webp").lower()  # webp, png or original
+    REPORT_IMAGE_QUALITY = int(os.getenv("REPORT_IMAGE_QUALITY", "80"))  # WebP quality
+    REPORT_LOGO_MAX_WIDTH = int(os.getenv("REPORT_LOGO_MAX_WIDTH", "240"))  # Pixels (2x the displayed size)
+    REPORT_IMAGE_MAX_WIDTH = int(os.getenv("REPORT_IMAGE_MAX_WIDTH", "800"))  # Pixels
+    REPORT_EMBED_FONTS = os.getenv("REPORT_EMBED_FONTS", "true").lower() in ("1", "true", "yes")  # Inline subset Poppins
+    REPORT_MINIFY = os.getenv("REPORT_MINIFY", "true").lower() in ("1", "true", "yes")
+    REPORT_TARGET_BYTES = int(os.getenv("REPORT_TARGET_BYTES", "200000"))  # Warn above this size
+    MARKDOWN_CACHE_ENTRIES = int(os.getenv("MARKDOWN_CACHE_ENTRIES", "512"))  # Rendered sections kept in memory
+    TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", os.path.join("data", "template_cache"))  # Empty to disable
+    TEMPLATE_HOT_RELOAD = os.getenv("TEMPLATE_HOT_RELOAD", "false").lower() in ("1", "true", "yes")  # Development only
+    REPORT_SPOOL_MAX_BYTES = int(os.getenv("REPORT_SPOOL_MAX_BYTES", str(2 * 1024 * 1024)))  # Larger reports spill to disk
     
     # Values data - All 65 predetermined values
     VALUES_LIST = [
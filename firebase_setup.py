@@ -63,17 +63,15 @@ def setup_collections(db):
     ]
     
     for code_data in test_codes:
-        # Check if code already exists
-        query = access_codes_ref.where('code', '==', code_data["code"]).limit(1)
-        results = query.get()
+        # Codes are stored under the code itself as the document ID
+        doc_ref = access_codes_ref.document(code_data["code"])
         
-        if len(results) == 0:
+        if not doc_ref.get().exists:
             # Add new code
-            access_codes_ref.add(code_data)
+            doc_ref.set(code_data)
             print(f"Added access code: {code_data['code']}")
         else:
             # Update existing code
-            doc_ref = access_codes_ref.document(results[0].id)
             doc_ref.update({"remaining_uses": code_data["remaining_uses"]})
             print(f"Updated access code: {code_data['code']}")
     
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Access code redemption for the Values Report Bot
+
+Each code is stored in the access_codes collection under the code itself as
+the document ID (see tools/migrate_access_codes.py for older, query-keyed
+collections), so redemption is a direct key lookup rather than a query.
+Uses are taken from an access code inside a Firestore transaction, which
+re-reads remaining_uses and never lets it go below zero, so codes cannot be
+over-redeemed when many people enter the same cohort code at once. Codes
+that cannot be document IDs are rejected before anything else happens.
+
+Lease mode (ACCESS_CODE_LEASE_SIZE > 0) cuts round-trips further: one
+transaction claims a batch of uses, which are then handed out locally
+without touching Firestore. No lock is held during a transaction, so a
+burst on one code never leaves worker threads queued behind each other;
+threads that run out of leased uses at the same moment each claim a
+batch, and the extra uses simply stay leased. Unused leased uses are given
+back with an atomic Increment on shutdown. If the process dies first, those
+uses are lost; keep the lease small relative to the code's total uses.
+"""
+
+import re
+import logging
+import threading
+from firebase_admin import firestore
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+ACCESS_CODES_COLLECTION = 'access_codes'
+
+# Document IDs Firestore reserves (__name__ style)
+_RESERVED_ID = re.compile(r'^__.*__$')
+
+def is_valid_code(code):
+    """
+    Check whether a code can be used as a Firestore document ID
+
+    Args:
+        code (str): Access code
+
+    Returns:
+        bool: False for empty, oversized or reserved IDs and IDs containing '/'
+    """
+    return (
+        isinstance(code, str) and 0 < len(code.encode('utf-8')) <= 1500
+        and '/' not in code and code not in ('.', '..') and not _RESERVED_ID.match(code)
+    )
+
+def access_code_ref(db, code):
+    """
+    Get the document holding an access code
+
+    Args:
+        db (firestore.Client): Firestore client
+        code (str): Access code (must pass is_valid_code)
+
+    Returns:
+        DocumentReference: The code's document, which may not exist
+    """
+    return db.collection(ACCESS_CODES_COLLECTION).document(code)
+
+class AccessCodeRedeemer:
+    """Redeems access code uses from Firestore, optionally through local leases"""
+
+    def __init__(self, db, lease_size=0, max_attempts=10):
+        """
+        Args:
+            db (firestore.Client): Firestore client
+            lease_size (int): Uses to claim per transaction (0 to claim one at a time)
+            max_attempts (int): Transaction attempts before giving up under contention
+        """
+        self.db = db
+        self.lease_size = lease_size
+        self.max_attempts = max_attempts
+        # Only codes that exist get entries, so these stay as small as the collection
+        self._leases = {}
+        self._remaining = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, doc_ref, wanted):
+        """
+        Take up to `wanted` uses from a code in a transaction
+
+        Returns:
+            tuple: (uses claimed, uses left in Firestore); (0, 0) when none are left
+        """
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            remaining = (snapshot.to_dict() or {}).get('remaining_uses', 0) if snapshot.exists else 0
+            claimed = min(wanted, max(remaining, 0))
+            if claimed:
+                transaction.update(doc_ref, {'remaining_uses': remaining - claimed})
+            return claimed, remaining - claimed
+
+        return claim(self.db.transaction(max_attempts=self.max_attempts))
+
+    def forget(self, code):
+        """Drop what this process knows about a code, e.g. after its uses were reset"""
+        with self._lock:
+            self._remaining.pop(code, None)
+            self._leases.pop(code, None)
+
+    def redeem(self, code):
+        """
+        Use one redemption of an access code
+
+        Args:
+            code (str): Access code provided by the user
+
+        Returns:
+            bool: True if a use was redeemed, False if the code is unknown or used up
+            int: Remaining uses after this one (None if not redeemed); in lease
+                 mode this includes uses leased to this process
+        """
+        if not is_valid_code(code):
+            return False, None
+
+        with self._lock:
+            leased = self._leases.get(code, 0)
+            if leased > 0:
+                self._leases[code] = leased - 1
+                metrics.increment('access_codes.lease_hits')
+                return True, self._remaining.get(code, 0) + leased - 1
+
+        with metrics.timed('access_codes.claim'):
+            claimed, remaining = self._claim(access_code_ref(self.db, code), max(1, self.lease_size))
+        if not claimed:
+            return False, None
+
+        metrics.increment('access_codes.claims')
+        with self._lock:
+            leased = self._leases.get(code, 0) + claimed - 1
+            self._leases[code] = leased
+            self._remaining[code] = remaining
+        return True, remaining + leased
+
+    def release_leases(self):
+        """
+        Give unused leased uses back to their codes
+
+        Returns:
+            int: Uses returned
+        """
+        released = 0
+        with self._lock:
+            leases = [(code, uses) for code, uses in self._leases.items() if uses > 0]
+            self._leases.clear()
+        for code, uses in leases:
+            try:
+                access_code_ref(self.db, code).update({'remaining_uses': firestore.Increment(uses)})
+                released += uses
+            except Exception as e:
+                logger.error(f"Could not return {uses} leased use(s) of {code}: {e}")
+        if released:
+            logger.info(f"Returned {released} leased access code use(s)")
+        return released
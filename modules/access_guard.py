@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Screening of access code attempts for the Values Report Bot
+
+Before an attempt reaches the database it has to get past three cheap,
+in-process checks:
+
+- a per-user rate limit, so one person mashing guesses is slowed down;
+- a prefilter of valid codes (a Bloom filter, refreshed periodically), so
+  codes that were never issued are rejected without any network I/O;
+- a short-lived negative cache of codes the database recently rejected,
+  for used-up codes and the prefilter's occasional false positives.
+
+Attempts that pass are also subject to a global rate limit, which caps the
+database lookups a scan spread across many accounts can cause.
+
+The prefilter only knows codes that existed at its last refresh (plus any
+added through this process), so codes created elsewhere are accepted once
+it next refreshes. Until the first refresh succeeds, nothing is filtered.
+"""
+
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from config import Config
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of AccessCodeGuard.screen()
+ATTEMPT_ALLOWED = 'allowed'
+ATTEMPT_THROTTLED = 'throttled'
+ATTEMPT_REJECTED = 'rejected'
+
+class RateLimiter:
+    """Thread-safe token buckets, one per key, that refuse rather than wait when empty"""
+
+    def __init__(self, per_minute, burst, max_keys=100000):
+        """
+        Args:
+            per_minute (float): Attempts regained per minute
+            burst (int): Attempts allowed at once
+            max_keys (int): Keys tracked before idle ones are dropped
+        """
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key=None):
+        """
+        Take an attempt from a key's bucket
+
+        Args:
+            key (hashable): Bucket to take from (e.g. a user ID)
+
+        Returns:
+            bool: True if the attempt is allowed
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            # Keys that have been idle longest are at the front; a dropped key
+            # simply starts again with a full bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        Args:
+            capacity (int): Items expected to be added
+            error_rate (float): Acceptable false positive rate at that capacity
+        """
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        """Bit positions for an item, by double hashing one SHA-256 digest"""
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        """Add a string to the filter"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class AccessCodeGuard:
+    """Rate limits, negative cache and valid-code prefilter for access code attempts"""
+
+    def __init__(self, user_limiter, global_limiter, negative_ttl=120.0, negative_entries=10000,
+                 prefilter_refresh=300.0, prefilter_error_rate=0.01):
+        """
+        Args:
+            user_limiter (RateLimiter): Limits attempts per user
+            global_limiter (RateLimiter): Limits attempts reaching the database
+            negative_ttl (float): Seconds a rejected code is remembered (0 to disable)
+            negative_entries (int): Rejected codes remembered at most
+            prefilter_refresh (float): Seconds between prefilter rebuilds (0 to disable the prefilter)
+            prefilter_error_rate (float): Target false positive rate of the prefilter
+        """
+        self.user_limiter = user_limiter
+        self.global_limiter = global_limiter
+        self.negative_ttl = negative_ttl
+        self.negative_entries = negative_entries
+        self.prefilter_refresh = prefilter_refresh
+        self.prefilter_error_rate = prefilter_error_rate
+        self._negative = OrderedDict()
+        self._negative_lock = threading.Lock()
+        self._prefilter = None
+        self._prefilter_built = 0.0
+        self._code_source = None
+        self._added_codes = set()
+        self._refreshing = threading.Lock()
+
+    def set_code_source(self, code_source):
+        """
+        Set where the prefilter gets valid codes from and build it now
+
+        Args:
+            code_source (callable): Returns an iterable of all issued codes
+        """
+        self._code_source = code_source
+        if self.prefilter_refresh > 0:
+            self.refresh_prefilter()
+
+    def refresh_prefilter(self):
+        """
+        Rebuild the prefilter from the code source
+
+        Returns:
+            bool: True if it was rebuilt
+        """
+        if self._code_source is None or not self._refreshing.acquire(blocking=False):
+            return False
+        try:
+            codes = set(self._code_source()) | self._added_codes
+            prefilter = BloomFilter(max(1000, len(codes) * 2), self.prefilter_error_rate)
+            for code in codes:
+                prefilter.add(code)
+            self._prefilter = prefilter
+            self._prefilter_built = time.monotonic()
+            metrics.increment('access_guard.prefilter_refreshes')
+            logger.info(f"Access code prefilter rebuilt with {len(codes)} codes")
+            return True
+        except Exception as e:
+            # Keep the previous filter (if any) and try again after another interval
+            self._prefilter_built = time.monotonic()
+            logger.error(f"Error refreshing access code prefilter: {e}")
+            return False
+        finally:
+            self._refreshing.release()
+
+    def _refresh_if_stale(self):
+        """Rebuild the prefilter in the background once it is older than the refresh interval"""
+        if (
+            self.prefilter_refresh > 0 and self._code_source is not None
+            and time.monotonic() - self._prefilter_built >= self.prefilter_refresh
+            and not self._refreshing.locked()
+        ):
+            threading.Thread(target=self.refresh_prefilter, name="access-code-prefilter", daemon=True).start()
+
+    def _recently_rejected(self, code):
+        """Check the negative cache, dropping the entry if it has expired"""
+        with self._negative_lock:
+            expires = self._negative.get(code)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._negative[code]
+                return False
+            return True
+
+    def screen(self, user_id, code):
+        """
+        Decide whether an attempt may be checked against the database
+
+        Args:
+            user_id (int): Telegram user ID making the attempt
+            code (str): Code entered
+
+        Returns:
+            str: ATTEMPT_ALLOWED, ATTEMPT_THROTTLED (too many attempts; ask
+                 the user to wait) or ATTEMPT_REJECTED (known to be invalid)
+        """
+        if not self.user_limiter.allow(user_id):
+            metrics.increment('access_guard.throttled_user')
+            return ATTEMPT_THROTTLED
+
+        self._refresh_if_stale()
+        prefilter = self._prefilter
+        if self.prefilter_refresh > 0 and prefilter is not None and code not in prefilter:
+            metrics.increment('access_guard.prefilter_rejects')
+            return ATTEMPT_REJECTED
+
+        if self._recently_rejected(code):
+            metrics.increment('access_guard.negative_hits')
+            return ATTEMPT_REJECTED
+
+        if not self.global_limiter.allow():
+            metrics.increment('access_guard.throttled_global')
+            logger.warning("Global access code attempt limit reached")
+            return ATTEMPT_THROTTLED
+
+        return ATTEMPT_ALLOWED
+
+    def record_rejected(self, code):
+        """Remember that the database rejected a code"""
+        if self.negative_ttl <= 0:
+            return
+        with self._negative_lock:
+            self._negative.pop(code, None)
+            self._negative[code] = time.monotonic() + self.negative_ttl
+            while len(self._negative) > self.negative_entries:
+                self._negative.popitem(last=False)
+
+    def code_added(self, code):
+        """Accept a code that was just issued or topped up, without waiting for a refresh"""
+        with self._negative_lock:
+            self._negative.pop(code, None)
+        self._added_codes.add(code)
+        prefilter = self._prefilter
+        if prefilter is not None:
+            prefilter.add(code)
+
+# Shared guard used by the bot handlers and the database module
+access_guard = AccessCodeGuard(
+    user_limiter=RateLimiter(Config.ACCESS_CODE_USER_PER_MINUTE, Config.ACCESS_CODE_USER_BURST),
+    global_limiter=RateLimiter(Config.ACCESS_CODE_GLOBAL_PER_MINUTE, Config.ACCESS_CODE_GLOBAL_BURST),
+    negative_ttl=Config.ACCESS_CODE_NEGATIVE_TTL,
+    prefilter_refresh=Config.ACCESS_CODE_PREFILTER_REFRESH
+)
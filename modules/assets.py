@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Static asset cache for the Values Report Bot
+
+Images embedded in reports are read, optionally recompressed, and
+base64-encoded once, then served from an immutable in-memory cache. An entry
+is rebuilt only when the file's modification time changes.
+"""
+
+import io
+import os
+import base64
+import logging
+import threading
+from dataclasses import dataclass
+from modules import metrics
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; assets are embedded as-is without it
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CachedAsset:
+    """An encoded asset and the file state it was built from"""
+    path: str
+    mtime: float
+    source_size: int
+    mime_type: str
+    data_uri: str
+
+    @property
+    def encoded_size(self):
+        """Size of the data URI in bytes"""
+        return len(self.data_uri)
+
+def recompress_png(data):
+    """
+    Losslessly re-save PNG data with maximum compression
+
+    Args:
+        data (bytes): PNG file contents
+
+    Returns:
+        tuple: (data, mime_type); the original data if Pillow is unavailable
+               or recompression does not make it smaller
+    """
+    if Image is None:
+        return data, "image/png"
+
+    with Image.open(io.BytesIO(data)) as image:
+        output = io.BytesIO()
+        image.save(output, format="PNG", optimize=True)
+    optimized = output.getvalue()
+    return (optimized, "image/png") if len(optimized) < len(data) else (data, "image/png")
+
+@dataclass(frozen=True)
+class ImageOptimizer:
+    """
+    Transform that downscales an image and re-encodes it for embedding
+
+    Instances compare equal by their settings, so they can be used as part of
+    an asset cache key.
+    """
+    max_width: int = None
+    image_format: str = "webp"  # webp or png
+    quality: int = 80
+
+    def __call__(self, data):
+        """
+        Args:
+            data (bytes): Original image file contents
+
+        Returns:
+            tuple: (data, mime_type); the original PNG data if Pillow is
+                   unavailable or the result would not be smaller
+        """
+        if Image is None:
+            return data, "image/png"
+
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            if self.max_width and image.width > self.max_width:
+                height = round(image.height * self.max_width / image.width)
+                image = image.resize((self.max_width, height), Image.LANCZOS)
+
+            output = io.BytesIO()
+            if self.image_format == "webp":
+                image.save(output, format="WEBP", quality=self.quality, method=6)
+                mime_type = "image/webp"
+            else:
+                image.save(output, format="PNG", optimize=True)
+                mime_type = "image/png"
+
+        optimized = output.getvalue()
+        if len(optimized) >= len(data):
+            return data, "image/png"
+        return optimized, mime_type
+
+class AssetCache:
+    """Thread-safe cache of base64 data URIs for static files"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, mime_type="image/png", transform=None):
+        """Get the encoded form of a file; see fetch() for the arguments"""
+        return self.fetch(path, mime_type, transform)[0]
+
+    def fetch(self, path, mime_type="image/png", transform=None):
+        """
+        Get the encoded form of a file, rebuilding it if the file changed
+
+        Args:
+            path (str): File to embed
+            mime_type (str): MIME type used when no transform is given
+            transform (callable): Optional function taking the file bytes and
+                returning (bytes, mime_type), e.g. to recompress or resize
+
+        Returns:
+            tuple: (CachedAsset, hit) where hit is True if no encoding was needed
+
+        Raises:
+            OSError: If the file cannot be read
+        """
+        mtime = os.stat(path).st_mtime
+        key = (path, transform)
+        entry = self._entries.get(key)
+        if entry and entry.mtime == mtime:
+            return self._hit(entry)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.mtime == mtime:
+                return self._hit(entry)
+
+            with open(path, 'rb') as asset_file:
+                data = asset_file.read()
+            source_size = len(data)
+            if transform:
+                data, mime_type = transform(data)
+
+            encoded = base64.b64encode(data).decode('utf-8')
+            entry = CachedAsset(
+                path=path,
+                mtime=mtime,
+                source_size=source_size,
+                mime_type=mime_type,
+                data_uri=f"data:{mime_type};base64,{encoded}"
+            )
+            self._entries[key] = entry
+            metrics.increment('assets.misses')
+            logger.info(
+                f"Encoded asset {os.path.basename(path)}: "
+                f"{source_size} bytes -> {entry.encoded_size} bytes embedded"
+            )
+            return entry, False
+
+    def _hit(self, entry):
+        """Count a cache hit and the encoding work it avoided"""
+        metrics.increment('assets.hits')
+        metrics.increment('assets.bytes_saved', entry.encoded_size)
+        return entry, True
+
+# Shared cache used by the report generator
+asset_cache = AssetCache()
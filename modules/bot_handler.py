@@ -5,13 +5,23 @@
 Telegram Bot Handler for Values Report Bot
 """
 
+import time
 import logging
 import asyncio
+import threading
+import uuid
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ConversationHandler
-from modules.database import verify_access_code, store_user_data, store_report
-from modules.llm_integration import generate_all_sections, get_value_info
-from modules.report_generator import generate_report, cleanup_report
+from config import Config
+from modules.database import verify_access_code, store_user_data, store_report, AccessCodeCheckError
+from modules.access_guard import access_guard, ATTEMPT_ALLOWED, ATTEMPT_THROTTLED
+from modules.llm_integration import generate_all_sections
+from modules.value_catalog import resolve_profile
+from modules import report_generator
+from modules.report_queue import report_queue
+from modules.job_store import (
+    get_job_store, INSTANCE_ID, JOB_GENERATING, JOB_RENDERED, JOB_DELIVERED, JOB_FAILED
+)
 from modules.utils import (
     parse_values, validate_age, validate_country, 
     validate_occupation, format_values_for_display
@@ -19,26 +29,25 @@ from modules.utils import (
 
 logger = logging.getLogger(__name__)
 
-# Create an event loop for async operations
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
-
 # Define conversation states
 (
     ACCESS_CODE, 
     TOP_FIVE_VALUES, NEXT_FIVE_VALUES, 
     AGE, COUNTRY, OCCUPATION, 
-    REVIEW, GENERATING_REPORT
-) = range(8)
+    REVIEW
+) = range(7)
 
-def start(update, context):
+# Report jobs this instance holds the lease on
+_owned_jobs = set()
+
+async def start(update, context):
     """Start the conversation and ask for access code"""
     # Initialize user data storage in context
     context.user_data.clear()
     context.user_data['telegram_id'] = update.effective_user.id
     context.user_data['telegram_username'] = update.effective_user.username
     
-    update.message.reply_text(
+    await update.message.reply_text(
         "Welcome to the Personal Values Report Bot! 🌟\n\n"
         "Thanks for taking part in the Values exercise by Halogen.\n\n"
         "I'll help you create a personalised values report based on your inputs.\n\n"
@@ -47,15 +56,35 @@ def start(update, context):
     
     return ACCESS_CODE
 
-def handle_access_code(update, context):
+async def handle_access_code(update, context):
     """Verify the access code provided by the user"""
     access_code = update.message.text.strip()
     
+    # Screen out throttled attempts and codes known to be invalid without a database lookup
+    attempt = access_guard.screen(update.effective_user.id, access_code)
+    if attempt == ATTEMPT_THROTTLED:
+        await update.message.reply_text(
+            "⏳ Too many access code attempts. Please wait a few minutes and try again."
+        )
+        return ACCESS_CODE
+    
     # Verify the access code
-    is_valid, remaining_uses = verify_access_code(access_code)
+    if attempt == ATTEMPT_ALLOWED:
+        try:
+            is_valid, remaining_uses = await asyncio.to_thread(verify_access_code, access_code)
+        except AccessCodeCheckError:
+            # Not a verdict on the code, so it must not go into the negative cache
+            await update.message.reply_text(
+                "⚠️ We couldn't check your access code just now. Please try again in a moment."
+            )
+            return ACCESS_CODE
+        if not is_valid:
+            access_guard.record_rejected(access_code)
+    else:
+        is_valid = False
     
     if not is_valid:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⚠️ Invalid access code. Please check your code and try again, or contact the administrator."
         )
         return ACCESS_CODE
@@ -64,7 +93,7 @@ def handle_access_code(update, context):
     context.user_data['access_code'] = access_code
     
     # Proceed to collect values
-    update.message.reply_text(
+    await update.message.reply_text(
         f"✅ Access code verified! We can now proceed with creating your values report.\n\n"
         f"Let's start with your top 5 values in ranked order (1st to 5th).\n\n"
         f"Please enter your top 5 values, separated by commas, in order of importance:"
@@ -72,12 +101,12 @@ def handle_access_code(update, context):
     
     return TOP_FIVE_VALUES
 
-def collect_top_five_values(update, context):
+async def collect_top_five_values(update, context):
     """Collect the top 5 ranked values from the user"""
     # Check if this is a callback query (edit request)
     if update.callback_query:
-        update.callback_query.answer()
-        update.callback_query.edit_message_text(
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(
             "Let's update your top 5 values in ranked order (1st to 5th).\n\n"
             "Please enter your top 5 values, separated by commas, in order of importance:"
         )
@@ -88,7 +117,7 @@ def collect_top_five_values(update, context):
     
     # Validate we have at least 5 values
     if len(values) < 5:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⚠️ Please provide at least 5 values, separated by commas, in order of importance (1st to 5th)."
         )
         return TOP_FIVE_VALUES
@@ -97,16 +126,8 @@ def collect_top_five_values(update, context):
     top_values = values[:5]
     context.user_data['top_values'] = top_values
     
-    # Get Schwartz categories for each value
-    schwartz_categories = []
-    for value in top_values:
-        _, schwartz_cat, _ = get_value_info(value)
-        schwartz_categories.append(schwartz_cat if schwartz_cat else "Unknown")
-    
-    context.user_data['schwartz_categories'] = schwartz_categories
-    
     # Continue to next five values
-    update.message.reply_text(
+    await update.message.reply_text(
         f"Great! Your top 5 values in order are:\n"
         f"1. {top_values[0]}\n"
         f"2. {top_values[1]}\n"
@@ -118,12 +139,12 @@ def collect_top_five_values(update, context):
     
     return NEXT_FIVE_VALUES
 
-def collect_next_five_values(update, context):
+async def collect_next_five_values(update, context):
     """Collect the next 5 values (not ranked) from the user"""
     # Check if this is a callback query (edit request)
     if update.callback_query:
-        update.callback_query.answer()
-        update.callback_query.edit_message_text(
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(
             "Let's update your next 5 values (positions 6-10) in no particular order.\n\n"
             "Please enter your next 5 values, separated by commas:"
         )
@@ -134,7 +155,7 @@ def collect_next_five_values(update, context):
     
     # Validate we have at least 1 value
     if not values:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⚠️ Please provide at least one value for positions 6-10."
         )
         return NEXT_FIVE_VALUES
@@ -144,7 +165,7 @@ def collect_next_five_values(update, context):
     context.user_data['next_values'] = next_values
     
     # Continue to age collection
-    update.message.reply_text(
+    await update.message.reply_text(
         f"Excellent! You've provided the following values for positions 6-10:\n"
         f"{format_values_for_display(next_values)}\n\n"
         f"Now, please enter your age:"
@@ -152,12 +173,12 @@ def collect_next_five_values(update, context):
     
     return AGE
 
-def collect_age(update, context):
+async def collect_age(update, context):
     """Collect age information from the user"""
     # Check if this is a callback query (edit request)
     if update.callback_query:
-        update.callback_query.answer()
-        update.callback_query.edit_message_text(
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(
             "Let's update your age.\n\n"
             "Please enter your age:"
         )
@@ -167,25 +188,25 @@ def collect_age(update, context):
     is_valid, result = validate_age(update.message.text)
     
     if not is_valid:
-        update.message.reply_text(result)
+        await update.message.reply_text(result)
         return AGE
     
     # Store age
     context.user_data['age'] = result
     
     # Continue to country collection
-    update.message.reply_text(
+    await update.message.reply_text(
         f"Thank you. Now, please enter your country of residence:"
     )
     
     return COUNTRY
 
-def collect_country(update, context):
+async def collect_country(update, context):
     """Collect country information from the user"""
     # Check if this is a callback query (edit request)
     if update.callback_query:
-        update.callback_query.answer()
-        update.callback_query.edit_message_text(
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(
             "Let's update your country of residence.\n\n"
             "Please enter your country:"
         )
@@ -195,25 +216,25 @@ def collect_country(update, context):
     is_valid, result = validate_country(update.message.text)
     
     if not is_valid:
-        update.message.reply_text(result)
+        await update.message.reply_text(result)
         return COUNTRY
     
     # Store country
     context.user_data['country'] = result
     
     # Continue to occupation collection
-    update.message.reply_text(
+    await update.message.reply_text(
         f"Thank you. Finally, please enter your occupation:"
     )
     
     return OCCUPATION
 
-def collect_occupation(update, context):
+async def collect_occupation(update, context):
     """Collect occupation information from the user"""
     # Check if this is a callback query (edit request)
     if update.callback_query:
-        update.callback_query.answer()
-        update.callback_query.edit_message_text(
+        await update.callback_query.answer()
+        await update.callback_query.edit_message_text(
             "Let's update your occupation.\n\n"
             "Please enter your occupation:"
         )
@@ -223,18 +244,18 @@ def collect_occupation(update, context):
     is_valid, result = validate_occupation(update.message.text)
     
     if not is_valid:
-        update.message.reply_text(result)
+        await update.message.reply_text(result)
         return OCCUPATION
     
     # Store occupation
     context.user_data['occupation'] = result
     
     # Continue to review inputs
-    review_inputs(update, context)
+    await review_inputs(update, context)
     
     return REVIEW
 
-def review_inputs(update, context):
+async def review_inputs(update, context):
     """Show a summary of collected data and ask for confirmation"""
     top_values = context.user_data.get('top_values', [])
     next_values = context.user_data.get('next_values', [])
@@ -281,133 +302,348 @@ def review_inputs(update, context):
     
     # Send or edit the message
     if update.callback_query:
-        update.callback_query.edit_message_text(review_message, reply_markup=reply_markup)
+        await update.callback_query.edit_message_text(review_message, reply_markup=reply_markup)
     else:
-        update.message.reply_text(review_message, reply_markup=reply_markup)
+        await update.message.reply_text(review_message, reply_markup=reply_markup)
     
     return REVIEW
 
-def confirm_inputs(update, context):
+async def confirm_inputs(update, context):
     """Handle confirmation to generate the report"""
     query = update.callback_query
-    query.answer()
+    await query.answer()
     
-    # Inform user that report generation is starting
-    query.edit_message_text(
-        "📊 Thank you for confirming your information!\n\n"
-        "I'm now generating your personalised values report. This may take a minute or two...\n\n"
-        "Please wait while I process your data and create your report."
-    )
+    # Resolve the values once; the prompts, report and storage all reuse this profile
+    context.user_data['value_profile'] = resolve_profile(context.user_data)
     
     # Store user data in database
     user_id = update.effective_user.id
-    success, record_id = store_user_data(user_id, context.user_data)
+    success, record_id = await asyncio.to_thread(store_user_data, user_id, context.user_data)
     
     if not success:
-        query.edit_message_text(
+        await query.edit_message_text(
             "⚠️ There was an error storing your data. Please try again later or contact support."
         )
         return ConversationHandler.END
     
-    # Generate report sections
-    generate_report_for_user(update, context)
+    # Record the job and hand it over to the report queue so this handler returns right away
+    job = {
+        'job_id': uuid.uuid4().hex,
+        'chat_id': query.message.chat_id,
+        'message_id': query.message.message_id,
+        'user_data': dict(context.user_data),
+        'sections': {}
+    }
+    await asyncio.to_thread(
+        get_job_store().create_job, job['job_id'], job['chat_id'], job['message_id'], job['user_data'],
+        INSTANCE_ID, Config.JOB_LEASE_SECONDS
+    )
+    _owned_jobs.add(job['job_id'])
+    
+    position = _queue_report_job(context.bot, job)
+    
+    if position is None:
+        _owned_jobs.discard(job['job_id'])
+        await asyncio.to_thread(get_job_store().delete_job, job['job_id'])
+        keyboard = [[InlineKeyboardButton("🔄 Try Again", callback_data="confirm")]]
+        await query.edit_message_text(
+            "⏳ We're generating a lot of reports right now and the queue is full.\n\n"
+            "Please try again in a few minutes.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+        return REVIEW
     
-    return GENERATING_REPORT
+    if position > 0:
+        await query.edit_message_text(
+            "📊 Thank you for confirming your information!\n\n"
+            f"You are #{position} in line. I'll start on your personalised values report shortly "
+            "and send it here as soon as it's ready."
+        )
+    
+    return ConversationHandler.END
 
-def generate_report_for_user(update, context):
-    """Generate the report using LLM and send HTML to user"""
-    user_id = update.effective_user.id
+async def resume_unfinished_reports(bot):
+    """
+    Queue every unfinished report job whose owner has stopped renewing its lease
+    
+    Each job is claimed first, so a job another running instance is still
+    working on is left alone. Sections that were already generated are
+    reused, so resuming never pays for the same LLM call twice.
     
+    Args:
+        bot (telegram.Bot): Bot used to deliver the reports
+        
+    Returns:
+        int: Number of jobs resumed
+    """
+    store = get_job_store()
+    resumed = 0
+    for job in await asyncio.to_thread(store.get_unfinished_jobs):
+        job_id = job['job_id']
+        if job_id in _owned_jobs:
+            continue
+        claimed = await asyncio.to_thread(store.claim_job, job_id, INSTANCE_ID, Config.JOB_LEASE_SECONDS)
+        if not claimed:
+            continue
+        _owned_jobs.add(job_id)
+        if _queue_report_job(bot, job) is None:
+            _owned_jobs.discard(job_id)
+            await asyncio.to_thread(store.release_job, job_id, INSTANCE_ID)
+            logger.warning(f"Report queue full, job {job_id} will be resumed later")
+            continue
+        resumed += 1
+    
+    if resumed:
+        logger.info(f"Resumed {resumed} unfinished report jobs")
+    return resumed
+
+async def maintain_report_jobs(bot):
+    """
+    Keep renewing the leases on this instance's jobs and take over abandoned ones
+    
+    Runs until cancelled. Renews every third of the lease, so a lease only
+    expires once its owner has stopped or lost touch with the job store.
+    
+    Args:
+        bot (telegram.Bot): Bot used to deliver resumed reports
+    """
+    interval = max(1.0, Config.JOB_LEASE_SECONDS / 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for job_id in list(_owned_jobs):
+                renewed = await asyncio.to_thread(
+                    get_job_store().renew_lease, job_id, INSTANCE_ID, Config.JOB_LEASE_SECONDS
+                )
+                if not renewed and job_id in _owned_jobs:
+                    logger.warning(f"Lost the lease on report job {job_id}")
+            await resume_unfinished_reports(bot)
+        except Exception as e:
+            logger.error(f"Error maintaining report job leases: {e}", exc_info=True)
+
+def release_report_jobs():
+    """
+    Give up the leases on this instance's unfinished jobs, e.g. on shutdown
+    
+    Another instance (or the next start) can then resume them right away
+    instead of waiting for the leases to expire.
+    
+    Returns:
+        int: Number of jobs released
+    """
+    released = 0
+    for job_id in list(_owned_jobs):
+        try:
+            get_job_store().release_job(job_id, INSTANCE_ID)
+            released += 1
+        except Exception as e:
+            logger.error(f"Error releasing report job {job_id}: {e}")
+        _owned_jobs.discard(job_id)
+    
+    if released:
+        logger.info(f"Released {released} unfinished report jobs")
+    return released
+
+def _queue_report_job(bot, job):
+    """Submit a job to the report queue, returning its position or None if full"""
+    return report_queue.submit(
+        job['job_id'], generate_report_for_user, bot, job,
+        on_start=lambda: _notify_generation_started(bot, job['chat_id'], job['message_id'])
+    )
+
+async def _notify_generation_started(bot, chat_id, message_id):
+    """Let the user know that a worker has started on their report"""
+    await _edit_progress(
+        bot, chat_id, message_id,
+        "📊 Thank you for confirming your information!\n\n"
+        "I'm now generating your personalised values report. This may take a minute or two...\n\n"
+        "Please wait while I process your data and create your report."
+    )
+
+async def _edit_progress(bot, chat_id, message_id, text):
+    """Edit the progress message, ignoring failures such as unchanged text"""
     try:
-        # Get user data
-        user_data = context.user_data
+        await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+    except Exception as e:
+        logger.warning(f"Could not update progress message for chat {chat_id}: {e}")
+
+class ReportProgress:
+    """
+    Keeps the user's progress message up to date while sections are generated
+    
+    Shows which sections are done and a short preview of the latest text, so
+    the user sees the report taking shape as soon as the first section starts
+    streaming. Streamed updates are throttled to Config.PROGRESS_EDIT_INTERVAL
+    to stay within Telegram's edit limits.
+    
+    Must be created on the event loop; section_partial may then be called
+    from any thread.
+    """
+    
+    def __init__(self, bot, chat_id, message_id, completed_titles=()):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self._loop = asyncio.get_running_loop()
+        self._done = set(completed_titles)
+        self._preview_title = None
+        self._preview_text = ""
+        self._last_edit = 0.0
+        self._lock = threading.Lock()
+    
+    def section_partial(self, title, text):
+        """Show streamed text for a section, at most once per edit interval"""
+        with self._lock:
+            if time.monotonic() - self._last_edit < Config.PROGRESS_EDIT_INTERVAL:
+                return
+            if title in self._done:
+                return
+            self._preview_title, self._preview_text = title, text
+            message = self._render()
+        asyncio.run_coroutine_threadsafe(
+            _edit_progress(self.bot, self.chat_id, self.message_id, message), self._loop
+        )
+    
+    async def section_complete(self, title, content):
+        """Mark a section as done and preview its content"""
+        with self._lock:
+            self._done.add(title)
+            self._preview_title, self._preview_text = title, content
+            message = self._render()
+        await _edit_progress(self.bot, self.chat_id, self.message_id, message)
+    
+    def _render(self):
+        """Build the progress message and restart the throttle (caller holds the lock)"""
+        self._last_edit = time.monotonic()
         
-        # Generate content for all sections
-        sections_content, prompts_used = loop.run_until_complete(generate_all_sections(user_data))
+        lines = [
+            f"📊 Generating your personalised values report "
+            f"({len(self._done)}/{len(Config.REPORT_SECTIONS)} sections ready)...\n"
+        ]
+        for section in Config.REPORT_SECTIONS:
+            icon = "✅" if section['title'] in self._done else "⏳"
+            lines.append(f"{icon} {section['title']}")
         
-        # Store report data
-        report_data = {
-            'sections_content': sections_content,
-            'prompts_used': prompts_used,
-            'generation_date': 'now()'
-        }
-        store_report(user_id, report_data)
+        if self._preview_text:
+            preview = self._preview_text.strip()
+            if len(preview) > Config.PROGRESS_PREVIEW_CHARS:
+                preview = preview[:Config.PROGRESS_PREVIEW_CHARS].rsplit(' ', 1)[0] + "…"
+            lines.append(f"\nPreview of \"{self._preview_title}\":\n{preview}")
         
-        # Generate HTML report
-        success, result = generate_report(user_data, sections_content)
+        return "\n".join(lines)
+
+async def generate_report_for_user(bot, job):
+    """
+    Generate the report using LLM and send HTML to user
+    
+    Runs as a report queue task, outside of the update handlers. Progress is
+    recorded in the job store so the job can be resumed after a restart.
+    
+    Args:
+        bot (telegram.Bot): Bot used to talk to the user
+        job (dict): Report job as returned by the job store
+    """
+    store = get_job_store()
+    job_id = job['job_id']
+    chat_id = job['chat_id']
+    message_id = job['message_id']
+    user_data = job['user_data']
+    user_id = user_data.get('telegram_id', chat_id)
+    
+    try:
+        await asyncio.to_thread(store.set_state, job_id, JOB_GENERATING)
+        
+        # Generate content for all sections, saving each one and showing the
+        # user a preview as soon as it is ready
+        progress = ReportProgress(bot, chat_id, message_id, (job.get('sections') or {}).keys())
+        
+        async def on_section_complete(title, content, prompt):
+            await asyncio.to_thread(store.save_section, job_id, title, content, prompt)
+            await progress.section_complete(title, content)
+        
+        sections_content, prompts_used = await generate_all_sections(
+            user_data,
+            completed_sections=job.get('sections'),
+            on_section_complete=on_section_complete,
+            on_section_partial=progress.section_partial
+        )
+        
+        # Store report data (already done if the job was interrupted after storing it)
+        if not job.get('stored'):
+            report_data = {
+                'sections_content': sections_content,
+                'prompts_used': prompts_used,
+                'generation_date': 'now()'
+            }
+            await asyncio.to_thread(store_report, user_id, report_data, user_data)
+            await asyncio.to_thread(store.mark_stored, job_id)
+        
+        # Generate the report document (CPU-bound, so off the event loop)
+        success, result = await asyncio.to_thread(report_generator.generate_report, user_data, sections_content)
         
         if not success:
-            if update.callback_query:
-                update.callback_query.edit_message_text(
-                    f"⚠️ Error generating report: {result}"
-                )
-            else:
-                update.message.reply_text(
-                    f"⚠️ Error generating report: {result}"
-                )
-            return ConversationHandler.END
+            await asyncio.to_thread(store.set_state, job_id, JOB_FAILED)
+            await _edit_progress(bot, chat_id, message_id, f"⚠️ Error generating report: {result}")
+            return
+        
+        await asyncio.to_thread(store.set_state, job_id, JOB_RENDERED)
         
         # Send HTML to user
-        html_path = result
+        report = result
         
         # Message indicating report is ready
-        if update.callback_query:
-            update.callback_query.edit_message_text(
-                "✅ Your personalised values report is ready!\n\n"
-                "Here's what's included in your report:\n"
-                "- What does this mean for me?\n"
-                "- Are my values in parallel or in tension?\n"
-                "- What do my values say about how I make decisions?\n"
-                "- What do my values say about how I build relationships?\n\n"
-                "I'm sending your report now..."
-            )
-        else:
-            update.message.reply_text(
-                "✅ Your personalized values report is ready!\n\n"
-                "Here's what's included in your report:\n"
-                "- What does this mean for me?\n"
-                "- Are my values in parallel or in tension?\n"
-                "- What do my values say about how I make decisions?\n"
-                "- What do my values say about how I build relationships?\n\n"
-                "I'm sending your report now..."
-            )
+        await _edit_progress(
+            bot, chat_id, message_id,
+            "✅ Your personalised values report is ready!\n\n"
+            "Here's what's included in your report:\n"
+            "- What does this mean for me?\n"
+            "- Are my values in parallel or in tension?\n"
+            "- What do my values say about how I make decisions?\n"
+            "- What do my values say about how I build relationships?\n\n"
+            "I'm sending your report now..."
+        )
         
-        # Send the HTML
-        with open(html_path, 'rb') as file:
-            context.bot.send_document(
-                chat_id=user_id,
-                document=file,
-                filename=f"Values_Report_{user_id}.html",
-                caption="Here is your personalised values report in HTML format! You can open it in any browser and print to PDF if needed. Take note that Telegram may pop up a warning for all HTML links, but rest assured this is normal."
+        # Send the report straight from the in-memory buffer
+        if Config.REPORT_OUTPUT_FORMAT == 'pdf':
+            filename = f"Values_Report_{user_id}.pdf"
+            caption = "Here is your personalised values report in PDF format!"
+        else:
+            filename = f"Values_Report_{user_id}.html"
+            caption = "Here is your personalised values report in HTML format! You can open it in any browser and print to PDF if needed. Take note that Telegram may pop up a warning for all HTML links, but rest assured this is normal."
+        with report:
+            await bot.send_document(
+                chat_id=chat_id,
+                document=report,
+                filename=filename,
+                caption=caption
             )
         
-        # Cleanup the temporary HTML file
-        cleanup_report(html_path)
+        await asyncio.to_thread(store.set_state, job_id, JOB_DELIVERED)
         
-        # Thank the user and end conversation
-        context.bot.send_message(
-            chat_id=user_id,
+        # Thank the user
+        await bot.send_message(
+            chat_id=chat_id,
             text="Thank you for using the Personal Values Report Bot by Halogen! 🌟\n\n"
                 "If you'd like to create another report, just type /start to begin again."
         )
-        
-        return ConversationHandler.END
     
     except Exception as e:
         logger.error(f"Error generating report: {e}")
-        if update.callback_query:
-            update.callback_query.edit_message_text(
-                "⚠️ I encountered an error while generating your report. Please try again later."
-            )
-        else:
-            update.message.reply_text(
-                "⚠️ I encountered an error while generating your report. Please try again later."
-            )
-        return ConversationHandler.END
+        try:
+            await asyncio.to_thread(store.set_state, job_id, JOB_FAILED)
+        except Exception as store_err:
+            logger.error(f"Error marking job {job_id} as failed: {store_err}")
+        await _edit_progress(
+            bot, chat_id, message_id,
+            "⚠️ I encountered an error while generating your report. Please try again later."
+        )
+    
+    # Cancelled jobs skip this and stay owned until release_report_jobs() hands them back
+    _owned_jobs.discard(job_id)
 
-def cancel(update, context):
+async def cancel(update, context):
     """Cancel and end the conversation"""
-    update.message.reply_text(
+    await update.message.reply_text(
         "❌ Report generation canceled. Your data has not been saved.\n\n"
         "You can start again anytime by using the /start command."
     )
@@ -8,9 +8,14 @@ Database module for Firebase integration
 import logging
 import os
 import json
+import threading
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import NotFound
 from config import Config
+from modules.access_codes import AccessCodeRedeemer, ACCESS_CODES_COLLECTION, access_code_ref, is_valid_code
+from modules.access_guard import access_guard
+from modules.write_behind import WriteBehindQueue
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,11 @@ _memory_access_codes = {
     "TESTALT": 15
 }
 
+_memory_access_codes_lock = threading.Lock()
+
+class AccessCodeCheckError(Exception):
+    """Raised when an access code could not be checked, as opposed to being invalid"""
+
 _memory_users = {}
 _memory_reports = {}
 
@@ -48,8 +58,56 @@ except Exception as e:
     logger.error(f"Firebase initialization error: {e}")
     db = None
 
+# Redeems Firestore access codes transactionally (and through leases if enabled)
+_redeemer = AccessCodeRedeemer(
+    db,
+    lease_size=Config.ACCESS_CODE_LEASE_SIZE,
+    max_attempts=Config.ACCESS_CODE_MAX_ATTEMPTS
+) if db else None
+
+# Queues user, report and session writes and commits them in batches
+_writer = WriteBehindQueue(
+    db,
+    Config.WRITE_BEHIND_JOURNAL_PATH,
+    max_pending=Config.WRITE_BEHIND_MAX_PENDING,
+    batch_size=Config.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=Config.WRITE_BEHIND_FLUSH_INTERVAL
+) if db and Config.WRITE_BEHIND_ENABLED else None
+
+def _write_documents(writes):
+    """
+    Write documents through the write-behind queue if it is running, else directly in one batch
+    
+    Args:
+        writes (list): (DocumentReference, data, merge) tuples
+    """
+    if _writer is not None and _writer.running:
+        for doc_ref, data, merge in writes:
+            _writer.set(doc_ref.parent.id, doc_ref.id, data, merge=merge)
+        return
+    
+    batch = db.batch()
+    for doc_ref, data, merge in writes:
+        batch.set(doc_ref, data, merge=merge)
+    batch.commit()
+
+def user_ref(user_id):
+    """
+    Get the Firestore document of a user, which is keyed by Telegram ID
+    
+    Args:
+        user_id (int): Telegram user ID
+        
+    Returns:
+        DocumentReference: The user's document, which may not exist yet
+    """
+    return db.collection('users').document(str(user_id))
+
 def init_db():
     """Initialize database connection and verify collections"""
+    access_guard.set_code_source(list_access_codes)
+    if _writer is not None and not _writer.running:
+        _writer.start()
     try:
         if db:
             # Try to access a collection to verify connection
@@ -75,49 +133,53 @@ def verify_access_code(code):
     Returns:
         bool: True if valid code with remaining uses, False otherwise
         int: Remaining uses after this use (None if invalid)
-    """
-    try:
-        logger.info(f"Attempting to verify access code: {code}")
         
-        # Check memory-based access codes first
+    Raises:
+        AccessCodeCheckError: If the code could not be checked (e.g. the
+            Firestore transaction failed), so the answer is unknown
+    """
+    logger.info(f"Attempting to verify access code: {code}")
+    
+    # Check memory-based access codes first
+    with _memory_access_codes_lock:
         if code in _memory_access_codes and _memory_access_codes[code] > 0:
-            remaining = _memory_access_codes[code]
             _memory_access_codes[code] -= 1
-            logger.info(f"Valid code found in memory: {code} (remaining: {remaining-1})")
-            return True, remaining - 1
-        
-        # Try Firebase verification as backup
-        if db:
-            try:
-                # Query for the access code
-                access_codes_ref = db.collection('access_codes')
-                query = access_codes_ref.where('code', '==', code).limit(1)
-                results = query.get()
-                
-                for doc in results:
-                    code_data = doc.to_dict()
-                    remaining_uses = code_data.get('remaining_uses', 0)
-                    logger.info(f"Found code in Firebase with remaining uses: {remaining_uses}")
-                    
-                    if remaining_uses > 0:
-                        # Update remaining uses
-                        doc_ref = access_codes_ref.document(doc.id)
-                        doc_ref.update({'remaining_uses': remaining_uses - 1})
-                        logger.info(f"Updated remaining uses for code: {code}")
-                        return True, remaining_uses - 1
-                    else:
-                        logger.info(f"Code found but has no remaining uses: {code}")
-                        return False, None
-                
-                logger.info(f"Code not found in Firebase: {code}")
-            except Exception as db_err:
-                logger.error(f"Firebase verification failed: {db_err}")
+            remaining = _memory_access_codes[code]
+            logger.info(f"Valid code found in memory: {code} (remaining: {remaining})")
+            return True, remaining
+    
+    # Try Firebase verification as backup
+    if _redeemer:
+        try:
+            redeemed, remaining = _redeemer.redeem(code)
+        except Exception as db_err:
+            logger.error(f"Firebase verification failed: {db_err}")
+            raise AccessCodeCheckError(f"Could not check access code: {db_err}") from db_err
         
-        return False, None
+        if redeemed:
+            logger.info(f"Redeemed code in Firebase: {code} (remaining: {remaining})")
+            return True, remaining
+        logger.info(f"Code not found in Firebase or has no remaining uses: {code}")
     
-    except Exception as e:
-        logger.error(f"Error verifying access code: {e}")
-        return False, None
+    return False, None
+
+def list_access_codes():
+    """
+    List every issued access code, whether or not it has uses left
+    
+    Returns:
+        list: Codes from memory and, if connected, Firebase
+    """
+    with _memory_access_codes_lock:
+        codes = list(_memory_access_codes)
+    
+    if db:
+        # Codes are document IDs, so only the IDs are fetched (an empty
+        # projection would return every field)
+        for doc in db.collection(ACCESS_CODES_COLLECTION).select(['__name__']).stream():
+            codes.append(doc.id)
+    
+    return codes
 
 def store_user_data(user_id, user_data):
     """
@@ -146,6 +208,7 @@ def store_user_data(user_id, user_data):
                     'access_code': user_data.get('access_code'),
                     'top_values': user_data.get('top_values', []),
                     'next_values': user_data.get('next_values', []),
+                    'value_profile': user_data.get('value_profile', []),
                     'age': user_data.get('age'),
                     'country': user_data.get('country'),
                     'occupation': user_data.get('occupation'),
@@ -153,23 +216,11 @@ def store_user_data(user_id, user_data):
                     'updated_at': firestore.SERVER_TIMESTAMP
                 }
                 
-                # Check if user already exists
-                users_ref = db.collection('users')
-                query = users_ref.where('telegram_id', '==', user_id).limit(1)
-                results = query.get()
-                
-                if len(results) > 0:
-                    # User exists, update
-                    doc_ref = users_ref.document(results[0].id)
-                    storage_data['updated_at'] = firestore.SERVER_TIMESTAMP  # Update timestamp
-                    doc_ref.update(storage_data)
-                    logger.info(f"User data updated in Firebase for user {user_id}")
-                    return True, results[0].id
-                else:
-                    # Create new user
-                    doc_ref = users_ref.add(storage_data)
-                    logger.info(f"User data added to Firebase for user {user_id}")
-                    return True, doc_ref[1].id
+                # Users are keyed by Telegram ID, so this creates or updates in one write
+                doc_ref = user_ref(user_id)
+                _write_documents([(doc_ref, storage_data, True)])
+                logger.info(f"User data stored in Firebase for user {user_id}")
+                return True, doc_ref.id
             except Exception as db_err:
                 logger.error(f"Firebase storage failed: {db_err}")
         
@@ -179,13 +230,15 @@ def store_user_data(user_id, user_data):
         logger.error(f"Error storing user data: {e}")
         return False, None
 
-def store_report(user_id, report_data):
+def store_report(user_id, report_data, user_data=None):
     """
     Store generated report data
     
     Args:
         user_id (int): Telegram user ID
         report_data (dict): Report data including prompts and responses
+        user_data (dict): The user's profile for the session record; read
+                          from the user's document if not given
         
     Returns:
         bool: True if successful, False otherwise
@@ -201,8 +254,6 @@ def store_report(user_id, report_data):
         # Try Firebase storage as backup
         if db:
             try:
-                reports_ref = db.collection('reports')
-                
                 # Prepare data for Firebase
                 fb_report_data = {
                     'telegram_id': user_id,
@@ -211,36 +262,34 @@ def store_report(user_id, report_data):
                     'generation_date': firestore.SERVER_TIMESTAMP
                 }
                 
-                # Add to Firestore
-                doc_ref = reports_ref.add(fb_report_data)
-                logger.info(f"Report data stored in Firebase for user {user_id}")
+                user_doc = user_ref(user_id)
+                if user_data is None:
+                    snapshot = user_doc.get()
+                    user_data = snapshot.to_dict() if snapshot.exists else None
                 
-                # Also store in user_sessions collection
-                users_ref = db.collection('users')
-                query = users_ref.where('telegram_id', '==', user_id).limit(1)
-                results = query.get()
+                # Write the report and its session record together
+                report_ref = db.collection('reports').document()
+                writes = [(report_ref, fb_report_data, False)]
                 
-                if len(results) > 0:
-                    user_doc_id = results[0].id
-                    user_data = results[0].to_dict()
-                    
-                    sessions_ref = db.collection('user_sessions')
+                if user_data is not None:
                     session_data = {
-                        'user_id': user_doc_id,
+                        'user_id': user_doc.id,
                         'telegram_id': user_id,
-                        'access_code': user_data.get('access_code', 'unknown'),
+                        'access_code': user_data.get('access_code') or 'unknown',
                         'top_values': user_data.get('top_values', []),
                         'next_values': user_data.get('next_values', []),
+                        'value_profile': user_data.get('value_profile', []),
                         'age': user_data.get('age'),
                         'country': user_data.get('country'),
                         'occupation': user_data.get('occupation'),
                         'session_start': firestore.SERVER_TIMESTAMP,
                         'session_end': firestore.SERVER_TIMESTAMP,
-                        'report_ref': doc_ref[1]
+                        'report_ref': report_ref
                     }
-                    
-                    sessions_ref.add(session_data)
-                    logger.info(f"Session data stored in Firebase for user {user_id}")
+                    writes.append((db.collection('user_sessions').document(), session_data, False))
+                
+                _write_documents(writes)
+                logger.info(f"Report and session data stored in Firebase for user {user_id}")
             except Exception as db_err:
                 logger.error(f"Firebase report storage failed: {db_err}")
         
@@ -263,32 +312,34 @@ def add_access_code(code, remaining_uses=5):
     """
     try:
         # Add to memory storage
-        _memory_access_codes[code] = remaining_uses
+        with _memory_access_codes_lock:
+            _memory_access_codes[code] = remaining_uses
         logger.info(f"Access code added to memory: {code} (uses: {remaining_uses})")
+        access_guard.code_added(code)
         
         # Add to Firebase
         if db:
             try:
-                access_codes_ref = db.collection('access_codes')
-                
-                # Check if code already exists
-                query = access_codes_ref.where('code', '==', code).limit(1)
-                results = query.get()
+                if not is_valid_code(code):
+                    logger.error(f"Access code cannot be used as a document ID: {code!r}")
+                    return False
                 
-                if len(results) > 0:
+                doc_ref = access_code_ref(db, code)
+                try:
                     # Update existing code
-                    doc_ref = access_codes_ref.document(results[0].id)
                     doc_ref.update({'remaining_uses': remaining_uses})
                     logger.info(f"Access code updated in Firebase: {code}")
-                else:
+                except NotFound:
                     # Add new code
-                    access_codes_ref.add({
+                    doc_ref.set({
                         'code': code,
                         'remaining_uses': remaining_uses,
                         'created_at': firestore.SERVER_TIMESTAMP
                     })
                     logger.info(f"Access code added to Firebase: {code}")
                 
+                if _redeemer:
+                    _redeemer.forget(code)
                 return True
             except Exception as db_err:
                 logger.error(f"Firebase access code storage failed: {db_err}")
@@ -297,4 +348,34 @@ def add_access_code(code, remaining_uses=5):
     
     except Exception as e:
         logger.error(f"Error adding access code: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def release_access_code_leases():
+    """
+    Return access code uses leased by this process but not handed out
+
+    Returns:
+        int: Uses returned
+    """
+    if not _redeemer:
+        return 0
+    try:
+        return _redeemer.release_leases()
+    except Exception as e:
+        logger.error(f"Error releasing access code leases: {e}")
+        return 0
+
+def flush_pending_writes():
+    """
+    Commit queued writes and stop the write-behind queue (call on shutdown)
+    
+    Returns:
+        bool: True if nothing was left uncommitted
+    """
+    if _writer is None or not _writer.running:
+        return True
+    try:
+        return _writer.shutdown()
+    except Exception as e:
+        logger.error(f"Error flushing queued writes: {e}")
+        return False
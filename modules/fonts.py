@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Font embedding for the Values Report Bot
+
+Reports embed the Poppins faces they use as inline WOFF2 data, subset to
+the characters in the report, so they render in the right font offline
+instead of depending on Google Fonts (which remains the fallback when
+fontTools is not installed). Subsetting takes a moment, so the CSS
+for each distinct character set is cached. Latin-1 and common typographic
+punctuation are always included, which means most reports share a single
+cached subset. Different character sets are subset in parallel; requests
+for a set that is already being built wait for that build.
+"""
+
+import io
+import os
+import base64
+import string
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from modules import metrics
+
+try:
+    from fontTools.ttLib import TTFont
+    from fontTools.subset import Subsetter, Options
+    import brotli  # noqa: F401  (needed by fontTools to write WOFF2)
+except ImportError:  # Without fontTools reports fall back to Google Fonts
+    TTFont = None
+
+logger = logging.getLogger(__name__)
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'fonts')
+
+# (file name, CSS weight, CSS style) for the faces used by the report: light
+# text, body text, emphasis, headings and bold text from the section markdown
+POPPINS_FACES = [
+    ('Poppins-Light.ttf', 300, 'normal'),
+    ('Poppins-Regular.ttf', 400, 'normal'),
+    ('Poppins-Italic.ttf', 400, 'italic'),
+    ('Poppins-SemiBold.ttf', 600, 'normal'),
+    ('Poppins-Bold.ttf', 700, 'normal'),
+]
+
+# Used instead of embedded fonts when they cannot be built
+GOOGLE_FONTS_IMPORT = (
+    "@import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');"
+)
+
+# Characters every subset contains: printable ASCII, Latin-1 and the
+# punctuation LLM output commonly uses (curly quotes, dashes, ellipsis, bullets)
+BASE_CHARACTERS = frozenset(
+    string.printable.strip() + ' '
+    + ''.join(chr(code) for code in range(0xA0, 0x100))
+    + '\u2018\u2019\u201a\u201c\u201d\u201e\u2013\u2014\u2026\u2022\u00b7\u2032\u2033\u20ac\u2122'
+)
+
+def fonts_available():
+    """Check whether fontTools (with WOFF2 support) is installed"""
+    return TTFont is not None
+
+class FontSubsetter:
+    """Builds and caches @font-face CSS with inline WOFF2 subsets"""
+
+    def __init__(self, font_dir=FONT_DIR, faces=None, cache_entries=32):
+        """
+        Args:
+            font_dir (str): Directory containing the font files
+            faces (list): (file name, weight, style) tuples to embed
+            cache_entries (int): Distinct character sets to keep CSS for
+        """
+        self.font_dir = font_dir
+        self.faces = faces or POPPINS_FACES
+        self.cache_entries = cache_entries
+        self._font_data = {}
+        self._cache = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _read_font(self, file_name):
+        """Read a font file once and keep its bytes"""
+        data = self._font_data.get(file_name)
+        if data is None:
+            with open(os.path.join(self.font_dir, file_name), 'rb') as font_file:
+                data = font_file.read()
+            self._font_data[file_name] = data
+        return data
+
+    def _subset(self, file_name, text):
+        """Subset one face to the given characters and encode it as WOFF2"""
+        font = TTFont(io.BytesIO(self._read_font(file_name)))
+        options = Options()
+        options.flavor = 'woff2'
+        options.hinting = False
+        options.desubroutinize = True
+        subsetter = Subsetter(options)
+        subsetter.populate(text=text)
+        subsetter.subset(font)
+
+        output = io.BytesIO()
+        font.flavor = 'woff2'
+        font.save(output)
+        return output.getvalue()
+
+    def font_face_css(self, text):
+        """
+        Get @font-face rules covering the characters in a report
+
+        Args:
+            text (str): Report text (markup is fine; it only adds ASCII)
+
+        Returns:
+            str: CSS with one inline WOFF2 @font-face rule per face, or an
+                 import of Google Fonts if fontTools is unavailable or
+                 subsetting fails
+        """
+        if not fonts_available():
+            return GOOGLE_FONTS_IMPORT
+
+        characters = ''.join(sorted(BASE_CHARACTERS | set(text)))
+        key = hashlib.sha256(characters.encode('utf-8')).hexdigest()
+        css = self._cache.get(key)
+        if css is not None:
+            metrics.increment('fonts.cache_hits')
+            return css
+
+        # One lock per character set being built, so other sets are not held up
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            css = self._cache.get(key)
+            if css is not None:
+                metrics.increment('fonts.cache_hits')
+                return css
+
+            try:
+                with metrics.timed('fonts.subset'):
+                    rules = []
+                    for file_name, weight, style in self.faces:
+                        encoded = base64.b64encode(self._subset(file_name, characters)).decode('ascii')
+                        rules.append(
+                            f"@font-face{{font-family:'Poppins';font-style:{style};"
+                            f"font-weight:{weight};font-display:swap;"
+                            f"src:url(data:font/woff2;base64,{encoded}) format('woff2')}}"
+                        )
+                    css = ''.join(rules)
+            except Exception as e:
+                logger.error(f"Error subsetting fonts: {e}", exc_info=True)
+                with self._lock:
+                    self._building.pop(key, None)
+                return GOOGLE_FONTS_IMPORT
+
+            # Cache the CSS before dropping the build lock, so a request for the
+            # same set never finds neither and builds it again
+            with self._lock:
+                self._cache[key] = css
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+                self._building.pop(key, None)
+            metrics.increment('fonts.cache_misses')
+            logger.info(f"Built font subset for {len(characters)} characters ({len(css)} bytes of CSS)")
+            return css
+
+# Shared subsetter used by the report generator
+font_subsetter = FontSubsetter()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent report job store for the Values Report Bot
+
+Every confirmed report is recorded as a job that moves through the states
+queued -> generating -> rendered -> delivered (or failed). Completed sections
+are saved as soon as they are generated, so a report interrupted by a restart
+can be resumed without paying for the same LLM call twice.
+
+Each job is owned by the bot instance working on it, under a lease the owner
+keeps renewing. An instance only resumes a job it can claim, i.e. one whose
+lease has expired (its owner stopped or crashed), so a second instance or a
+rolling deploy never picks up a report another live instance is generating.
+
+Two interchangeable backends are provided: a local SQLite file and a Firestore
+collection. Both implement the JobStore interface.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = 'queued'
+JOB_GENERATING = 'generating'
+JOB_RENDERED = 'rendered'
+JOB_DELIVERED = 'delivered'
+JOB_FAILED = 'failed'
+
+UNFINISHED_STATES = (JOB_QUEUED, JOB_GENERATING, JOB_RENDERED)
+
+# Identifies this process as the owner of the jobs it works on
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+class JobStore:
+    """Interface shared by the job store backends"""
+
+    def create_job(self, job_id, chat_id, message_id, user_data, owner=None, lease_seconds=0):
+        """
+        Record a new queued job
+
+        Args:
+            job_id (str): Unique identifier of the job
+            chat_id (int): Chat the report is delivered to
+            message_id (int): Progress message shown to the user
+            user_data (dict): Snapshot of the user's conversation data
+            owner (str): Instance that will work on the job, if any
+            lease_seconds (float): How long the owner's claim lasts without renewal
+        """
+        raise NotImplementedError
+
+    def claim_job(self, job_id, owner, lease_seconds):
+        """
+        Take ownership of an unfinished job that nobody else holds a live lease on
+
+        Args:
+            job_id (str): Job to claim
+            owner (str): Instance claiming it
+            lease_seconds (float): How long the claim lasts without renewal
+
+        Returns:
+            bool: True if the job is now owned by owner
+        """
+        raise NotImplementedError
+
+    def renew_lease(self, job_id, owner, lease_seconds):
+        """
+        Extend the lease on a job, if owner still holds it
+
+        Returns:
+            bool: False if the job has finished or was claimed by another instance
+        """
+        raise NotImplementedError
+
+    def release_job(self, job_id, owner):
+        """Give up the lease on a job so another instance can claim it right away"""
+        raise NotImplementedError
+
+    def mark_stored(self, job_id):
+        """Record that the job's report and session were written to the database"""
+        raise NotImplementedError
+
+    def set_state(self, job_id, state):
+        """Move a job to a new state"""
+        raise NotImplementedError
+
+    def save_section(self, job_id, title, content, prompt):
+        """Save the content of a successfully generated section"""
+        raise NotImplementedError
+
+    def get_job(self, job_id):
+        """
+        Get a job by ID
+
+        Returns:
+            dict: Job with job_id, chat_id, message_id, user_data, state, stored
+                  and sections ({title: {'content', 'prompt'}}), or None if not found
+        """
+        raise NotImplementedError
+
+    def get_unfinished_jobs(self):
+        """
+        Get all jobs that have not been delivered or marked as failed
+
+        Returns:
+            list: Jobs in creation order, in the same format as get_job
+        """
+        raise NotImplementedError
+
+    def delete_job(self, job_id):
+        """Remove a job and its saved sections"""
+        raise NotImplementedError
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a local SQLite database file"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_jobs ("
+                "job_id TEXT PRIMARY KEY, chat_id INTEGER, message_id INTEGER, "
+                "user_data TEXT, state TEXT, created_at REAL, updated_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_job_sections ("
+                "job_id TEXT, title TEXT, content TEXT, prompt TEXT, "
+                "PRIMARY KEY (job_id, title))"
+            )
+            # Columns added after the first release
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(report_jobs)")}
+            for column, definition in (
+                ('owner', "TEXT"), ('lease_expires', "REAL DEFAULT 0"), ('stored', "INTEGER DEFAULT 0")
+            ):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE report_jobs ADD COLUMN {column} {definition}")
+
+        logger.info(f"Using SQLite job store at {path}")
+
+    def create_job(self, job_id, chat_id, message_id, user_data, owner=None, lease_seconds=0):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO report_jobs (job_id, chat_id, message_id, user_data, state, "
+                "created_at, updated_at, owner, lease_expires, stored) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (job_id, chat_id, message_id, json.dumps(user_data), JOB_QUEUED, now, now,
+                 owner, now + lease_seconds if owner else 0)
+            )
+
+    def claim_job(self, job_id, owner, lease_seconds):
+        now = time.time()
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATES)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE report_jobs SET owner = ?, lease_expires = ? "
+                f"WHERE job_id = ? AND state IN ({placeholders}) "
+                "AND (owner IS NULL OR owner = ? OR lease_expires < ?)",
+                (owner, now + lease_seconds, job_id, *UNFINISHED_STATES, owner, now)
+            )
+            return cursor.rowcount == 1
+
+    def renew_lease(self, job_id, owner, lease_seconds):
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATES)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE report_jobs SET lease_expires = ? "
+                f"WHERE job_id = ? AND owner = ? AND state IN ({placeholders})",
+                (time.time() + lease_seconds, job_id, owner, *UNFINISHED_STATES)
+            )
+            return cursor.rowcount == 1
+
+    def release_job(self, job_id, owner):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE report_jobs SET lease_expires = 0 WHERE job_id = ? AND owner = ?",
+                (job_id, owner)
+            )
+
+    def mark_stored(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE report_jobs SET stored = 1 WHERE job_id = ?", (job_id,))
+
+    def set_state(self, job_id, state):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE report_jobs SET state = ?, updated_at = ? WHERE job_id = ?",
+                (state, time.time(), job_id)
+            )
+
+    def save_section(self, job_id, title, content, prompt):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_job_sections VALUES (?, ?, ?, ?)",
+                (job_id, title, content, prompt)
+            )
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM report_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            return self._load_job(row) if row else None
+
+    def get_unfinished_jobs(self):
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM report_jobs WHERE state IN ({placeholders}) ORDER BY created_at",
+                UNFINISHED_STATES
+            ).fetchall()
+            return [self._load_job(row) for row in rows]
+
+    def delete_job(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM report_job_sections WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM report_jobs WHERE job_id = ?", (job_id,))
+
+    def _load_job(self, row):
+        """Build a job dict from a report_jobs row (caller holds the lock)"""
+        sections = {
+            section['title']: {'content': section['content'], 'prompt': section['prompt']}
+            for section in self._conn.execute(
+                "SELECT title, content, prompt FROM report_job_sections WHERE job_id = ?",
+                (row['job_id'],)
+            )
+        }
+        return {
+            'job_id': row['job_id'],
+            'chat_id': row['chat_id'],
+            'message_id': row['message_id'],
+            'user_data': json.loads(row['user_data']),
+            'state': row['state'],
+            'stored': bool(row['stored']),
+            'sections': sections
+        }
+
+class FirestoreJobStore(JobStore):
+    """Job store backed by the Firestore 'report_jobs' collection"""
+
+    def __init__(self, db):
+        from firebase_admin import firestore
+
+        self._firestore = firestore
+        self._db = db
+        self._jobs_ref = db.collection('report_jobs')
+        logger.info("Using Firestore job store")
+
+    def create_job(self, job_id, chat_id, message_id, user_data, owner=None, lease_seconds=0):
+        self._jobs_ref.document(job_id).set({
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'user_data': user_data,
+            'state': JOB_QUEUED,
+            'sections': {},
+            'owner': owner,
+            'lease_expires': time.time() + lease_seconds if owner else 0,
+            'stored': False,
+            'created_at': self._firestore.SERVER_TIMESTAMP,
+            'updated_at': self._firestore.SERVER_TIMESTAMP
+        })
+
+    def set_state(self, job_id, state):
+        self._jobs_ref.document(job_id).update({
+            'state': state,
+            'updated_at': self._firestore.SERVER_TIMESTAMP
+        })
+
+    def _update_lease(self, job_id, owner, lease_expires, claim):
+        """Set a job's lease in a transaction if owner may hold it"""
+        doc_ref = self._jobs_ref.document(job_id)
+
+        @self._firestore.transactional
+        def update(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return False
+            data = snapshot.to_dict()
+            if data.get('state') not in UNFINISHED_STATES:
+                return False
+            current_owner = data.get('owner')
+            if current_owner != owner and not (
+                claim and (current_owner is None or data.get('lease_expires', 0) < time.time())
+            ):
+                return False
+            transaction.update(doc_ref, {'owner': owner, 'lease_expires': lease_expires})
+            return True
+
+        return update(self._db.transaction())
+
+    def claim_job(self, job_id, owner, lease_seconds):
+        return self._update_lease(job_id, owner, time.time() + lease_seconds, claim=True)
+
+    def renew_lease(self, job_id, owner, lease_seconds):
+        return self._update_lease(job_id, owner, time.time() + lease_seconds, claim=False)
+
+    def release_job(self, job_id, owner):
+        self._update_lease(job_id, owner, 0, claim=False)
+
+    def mark_stored(self, job_id):
+        self._jobs_ref.document(job_id).update({'stored': True})
+
+    def save_section(self, job_id, title, content, prompt):
+        # Section titles contain characters that are not valid in field paths,
+        # so merge a nested map instead of updating a dotted path
+        self._jobs_ref.document(job_id).set(
+            {'sections': {title: {'content': content, 'prompt': prompt}}},
+            merge=True
+        )
+
+    def get_job(self, job_id):
+        doc = self._jobs_ref.document(job_id).get()
+        return self._load_job(doc) if doc.exists else None
+
+    def get_unfinished_jobs(self):
+        docs = self._jobs_ref.where('state', 'in', list(UNFINISHED_STATES)).get()
+        jobs = sorted(docs, key=lambda doc: doc.create_time)
+        return [self._load_job(doc) for doc in jobs]
+
+    def delete_job(self, job_id):
+        self._jobs_ref.document(job_id).delete()
+
+    def _load_job(self, doc):
+        """Build a job dict from a report_jobs document"""
+        data = doc.to_dict()
+        return {
+            'job_id': doc.id,
+            'chat_id': data.get('chat_id'),
+            'message_id': data.get('message_id'),
+            'user_data': data.get('user_data', {}),
+            'state': data.get('state'),
+            'stored': bool(data.get('stored')),
+            'sections': data.get('sections', {})
+        }
+
+def create_job_store():
+    """
+    Create the job store selected by Config.JOB_STORE_BACKEND
+
+    'firestore' and 'sqlite' select a backend explicitly; 'auto' uses Firestore
+    when it is connected and the local SQLite file otherwise.
+
+    Returns:
+        JobStore: The configured job store
+    """
+    from modules.database import db
+
+    backend = Config.JOB_STORE_BACKEND
+    if backend == 'firestore' or (backend == 'auto' and db):
+        if db:
+            return FirestoreJobStore(db)
+        logger.warning("Firestore job store requested but Firebase is not connected")
+
+    return SQLiteJobStore(Config.JOB_STORE_PATH)
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+def get_job_store():
+    """
+    Get the job store shared by the bot handlers, creating it on first use
+
+    Created lazily so that importing this module (e.g. from batch_reports,
+    which keeps its own store) does not connect to Firebase or create files.
+
+    Returns:
+        JobStore: The shared job store
+    """
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = create_job_store()
+    return _job_store
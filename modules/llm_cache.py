@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+LLM response cache for the Values Report Bot
+
+Participants in the same cohort often enter the same values and similar
+details, which produces identical prompts. Responses are cached under a hash
+of the section, the fully rendered prompt and the model settings, in a
+bounded in-memory LRU tier backed by a persistent SQLite tier with a TTL.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from config import Config
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Number of disk writes between expiry/eviction sweeps
+_SWEEP_INTERVAL = 100
+
+def make_cache_key(section_id, prompt, model_version):
+    """
+    Build the cache key for an LLM request
+
+    Args:
+        section_id (str): Report section identifier (its title)
+        prompt (str): Fully rendered prompt
+        model_version (str): Model name and generation settings
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (section_id, model_version, prompt):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM responses"""
+
+    def __init__(self, path, memory_entries=256, disk_entries=10000, ttl=7 * 24 * 3600):
+        """
+        Args:
+            path (str): SQLite file for the disk tier, or None for memory only
+            memory_entries (int): Maximum entries kept in memory
+            disk_entries (int): Maximum entries kept on disk
+            ttl (float): Seconds before an entry expires
+        """
+        self.memory_entries = max(1, memory_entries)
+        self.disk_entries = max(1, disk_entries)
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._conn = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_responses ("
+                    "key TEXT PRIMARY KEY, response TEXT, created_at REAL, accessed_at REAL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS llm_responses_accessed ON llm_responses (accessed_at)"
+                )
+            self._sweep()
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Returns:
+            str: The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self._record('memory_hits')
+                return entry[0]
+            if entry:
+                del self._memory[key]
+
+            if self._conn:
+                row = self._conn.execute(
+                    "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] < self.ttl:
+                    with self._conn:
+                        self._conn.execute(
+                            "UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                    self._remember(key, row[0], row[1])
+                    self._record('disk_hits')
+                    return row[0]
+
+            self._record('misses')
+            return None
+
+    def set(self, key, response):
+        """Store a response in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._record('stores')
+
+            if self._conn:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                        (key, response, now, now)
+                    )
+                self._writes += 1
+                if self._writes % _SWEEP_INTERVAL == 0:
+                    self._sweep()
+
+    def stats(self):
+        """
+        Get hit and miss counters
+
+        Returns:
+            dict: Counters plus the overall hit rate
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, response, created_at):
+        """Add an entry to the memory tier, evicting the least recently used (caller holds the lock)"""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _sweep(self):
+        """Delete expired disk entries and trim the disk tier to its size limit"""
+        with self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            trimmed = self._conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_entries,)
+            ).rowcount
+        if expired or trimmed:
+            self._record('evictions', expired + trimmed)
+            logger.info(f"LLM cache sweep removed {expired} expired and {trimmed} old entries")
+
+    def _record(self, name, amount=1):
+        """Update a local counter and the shared metrics"""
+        self._stats[name] += amount
+        metrics.increment(f"llm_cache.{name}", amount)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Get the shared response cache
+
+    Returns:
+        ResponseCache: The cache, or None if Config.LLM_CACHE_ENABLED is off
+    """
+    global _cache
+    if not Config.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    Config.LLM_CACHE_PATH or None,
+                    memory_entries=Config.LLM_CACHE_MEMORY_ENTRIES,
+                    disk_entries=Config.LLM_CACHE_DISK_ENTRIES,
+                    ttl=Config.LLM_CACHE_TTL
+                )
+    return _cache
+
+def get_model_version():
+    """Identify the model and generation settings for cache keys"""
+    return f"{Config.GEMINI_MODEL}:{json.dumps(Config.GEMINI_GENERATION_CONFIG, sort_keys=True)}"
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Long-lived Google Gemini client for the Values Report Bot
+
+The Gemini API is configured and the model is built once, on first use, and
+then shared by every report. Reusing the model keeps the underlying API client
+and its connections alive instead of setting them up again for every section.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import requests
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from google.generativeai.types import generation_types
+from config import Config
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+class GeminiClient:
+    """Thread-safe wrapper around a single shared GenerativeModel"""
+
+    def __init__(self, api_key, model_name, generation_config=None, api_endpoint=None,
+                 request_timeout=None):
+        """
+        Args:
+            api_key (str): Gemini API key
+            model_name (str): Name of the Gemini model to use
+            generation_config (dict): Generation parameters passed to the model
+            api_endpoint (str): Alternative API endpoint (e.g. a local fake server),
+                which is reached over REST
+            request_timeout (float): Seconds before a blocking request is
+                abandoned by the transport itself, or None for no limit
+        """
+        self.api_key = api_key
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.api_endpoint = api_endpoint
+        self.request_timeout = request_timeout
+        self._model = None
+        self._lock = threading.Lock()
+        self._timing_hooks = [metrics.record_timing]
+
+    def add_timing_hook(self, hook):
+        """
+        Register a callable receiving (event, seconds) for every timed step
+
+        Events are 'llm.setup' (configuring the API and building the model,
+        once per client), 'llm.call_setup' (per-call overhead before the
+        request is sent), 'llm.first_chunk' (time to the first streamed chunk)
+        and 'llm.generate' (the request itself).
+        """
+        self._timing_hooks.append(hook)
+
+    @property
+    def model(self):
+        """The shared GenerativeModel, built on first access"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    if self.api_endpoint:
+                        genai.configure(
+                            api_key=self.api_key,
+                            transport="rest",
+                            client_options={"api_endpoint": self.api_endpoint}
+                        )
+                    else:
+                        genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(
+                        self.model_name,
+                        generation_config=self.generation_config
+                    )
+                    self._emit('llm.setup', time.perf_counter() - start)
+                    logger.info(f"Gemini model initialised: {self.model_name}")
+        return self._model
+
+    def generate(self, prompt, on_partial=None, **kwargs):
+        """
+        Generate content for a prompt
+
+        Args:
+            prompt (str): Prompt to send
+            on_partial (callable): If given, the response is streamed and this is
+                called with the text received so far after every chunk
+            **kwargs: Extra arguments passed to GenerativeModel.generate_content
+
+        Returns:
+            GenerateContentResponse: Response from the model
+
+        Raises:
+            TimeoutError: If the request times out, or a streamed response is
+                still arriving after request_timeout
+        """
+        start = time.perf_counter()
+        model = self.model
+        sent = time.perf_counter()
+        self._emit('llm.call_setup', sent - start)
+
+        try:
+            if on_partial is None:
+                response = self._generate_content(model, prompt, False, kwargs)
+            else:
+                response = self._generate_content(model, prompt, True, kwargs)
+                text = ""
+                for chunk in response:
+                    if not text:
+                        self._emit('llm.first_chunk', time.perf_counter() - sent)
+                    if self.request_timeout and time.perf_counter() - sent > self.request_timeout:
+                        raise TimeoutError(f"LLM response still streaming after {self.request_timeout}s")
+                    text += chunk.text
+                    try:
+                        on_partial(text)
+                    except Exception as e:
+                        logger.warning(f"Partial response callback failed: {e}")
+        except requests.exceptions.Timeout as e:
+            # Reported like any other timeout, so the scheduler retries it
+            raise TimeoutError(f"LLM request timed out after {self.request_timeout}s") from e
+
+        self._emit('llm.generate', time.perf_counter() - sent)
+        return response
+
+    def _generate_content(self, model, prompt, stream, kwargs):
+        """
+        Make a blocking generate_content call that the transport gives up on after request_timeout
+
+        GenerativeModel.generate_content has no timeout option, so the request
+        is built by the model and sent through its API client directly. A
+        timeout set only around the call would leave the request (and the
+        worker thread running it) going after the caller has moved on.
+        """
+        if not self.request_timeout:
+            return model.generate_content(prompt, stream=stream, **kwargs)
+
+        request = model._prepare_request(contents=prompt, **kwargs)
+        if model._client is None:
+            model._client = genai_client.get_default_generative_client()
+        if stream:
+            with generation_types.rewrite_stream_error():
+                iterator = model._client.stream_generate_content(request, timeout=self.request_timeout)
+            return generation_types.GenerateContentResponse.from_iterator(iterator)
+        response = model._client.generate_content(request, timeout=self.request_timeout)
+        return generation_types.GenerateContentResponse.from_response(response)
+
+    async def generate_async(self, prompt, on_partial=None, **kwargs):
+        """
+        Generate content for a prompt without blocking the event loop
+
+        Uses Gemini's asyncio client. The REST transport (used with a custom
+        api_endpoint) has no async client, so in that case the blocking call
+        runs in a worker thread instead, with request_timeout applied by the
+        transport so a slow request does not keep the thread. The async client is bound to the
+        event loop that first uses it, so each process should generate from
+        a single loop.
+
+        Args:
+            prompt (str): Prompt to send
+            on_partial (callable): If given, the response is streamed and this is
+                called with the text received so far after every chunk
+            **kwargs: Extra arguments passed to GenerativeModel.generate_content_async
+
+        Returns:
+            Response from the model
+        """
+        if self.api_endpoint:
+            return await asyncio.to_thread(self.generate, prompt, on_partial, **kwargs)
+
+        start = time.perf_counter()
+        model = self.model
+        sent = time.perf_counter()
+        self._emit('llm.call_setup', sent - start)
+
+        if on_partial is None:
+            response = await model.generate_content_async(prompt, **kwargs)
+        else:
+            response = await model.generate_content_async(prompt, stream=True, **kwargs)
+            text = ""
+            async for chunk in response:
+                if not text:
+                    self._emit('llm.first_chunk', time.perf_counter() - sent)
+                text += chunk.text
+                try:
+                    on_partial(text)
+                except Exception as e:
+                    logger.warning(f"Partial response callback failed: {e}")
+
+        self._emit('llm.generate', time.perf_counter() - sent)
+        return response
+
+    def _emit(self, event, seconds):
+        """Pass a timing to every registered hook"""
+        for hook in self._timing_hooks:
+            try:
+                hook(event, seconds)
+            except Exception as e:
+                logger.warning(f"Timing hook failed for {event}: {e}")
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """
+    Get the shared Gemini client, creating it from Config on first use
+
+    Returns:
+        GeminiClient: The shared client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient(
+                    Config.GEMINI_API_KEY,
+                    Config.GEMINI_MODEL,
+                    Config.GEMINI_GENERATION_CONFIG,
+                    Config.GEMINI_API_ENDPOINT,
+                    request_timeout=Config.LLM_SECTION_TIMEOUT
+                )
+    return _client
@@ -5,31 +5,35 @@
 LLM Integration module for Google Gemini API
 """
 
+import asyncio
+import functools
 import logging
-import google.generativeai as genai
 from config import Config
+from modules.llm_client import get_llm_client
+from modules.value_catalog import value_catalog
+from modules.prompt_builder import prompt_builder
+from modules.llm_cache import get_response_cache, make_cache_key, get_model_version
+from modules.llm_scheduler import get_llm_scheduler
 
 logger = logging.getLogger(__name__)
 
-# Configure the Gemini API
-genai.configure(api_key=Config.GEMINI_API_KEY)
+# Placeholder for a section that could not be generated
+FAILED_SECTION_TEXT = "Content generation failed for this section."
 
 def initialize_model():
-    """Initialize and return the Gemini model"""
+    """Return the shared Gemini client, building its model on first use"""
     try:
-        # Configure with the API key
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        
-        # Use the correct model name
-        model = genai.GenerativeModel('gemini-2.0-flash-lite')
-        return model
+        client = get_llm_client()
+        # Build the model now so configuration errors are reported here
+        client.model
+        return client
     except Exception as e:
         logger.error(f"Error initializing Gemini model: {e}")
         return None
 
 def get_value_info(value_name):
     """
-    Get information about a value from the hardcoded VALUES_LIST
+    Get information about a value from the value catalog
     
     Args:
         value_name (str): Name of the value
@@ -37,127 +41,46 @@ def get_value_info(value_name):
     Returns:
         tuple: (description, schwartz_category, gouveia_category) or (None, None, None) if not found
     """
-    # Normalize the value name for comparison
-    value_name_lower = value_name.lower().strip()
-    
-    # Look for exact match first
-    for value_info in Config.VALUES_LIST:
-        if value_info["value"].lower() == value_name_lower:
-            return (
-                value_info["description"], 
-                value_info["schwartz_category"], 
-                value_info["gouveia_category"]
-            )
-    
-    # If no exact match, look for partial match
-    for value_info in Config.VALUES_LIST:
-        if value_name_lower in value_info["value"].lower() or value_info["value"].lower() in value_name_lower:
-            return (
-                value_info["description"], 
-                value_info["schwartz_category"], 
-                value_info["gouveia_category"]
-            )
+    match = value_catalog.match(value_name)
+    if not match:
+        return None, None, None
     
-    # No match found
-    return None, None, None
+    return match.description, match.schwartz_category, match.gouveia_category
 
-def generate_prompt(user_data, section):
+def generate_prompt(user_data, section, context=None):
     """
     Generate a customized prompt based on user data and report section
     
     Args:
         user_data (dict): User's values and personal information
         section (dict): Report section data
+        context (PromptContext): Prebuilt prompt context for this user, if available
         
     Returns:
         str: Customized prompt for LLM
     """
-    # Extract all 10 values
-    top_values = user_data.get('top_values', [])
-    next_values = user_data.get('next_values', [])
-    
-    # Combine into a single list of all 10 values
-    all_values = []
-    all_values.extend(top_values[:5])  # First 5 ranked values
-    all_values.extend(next_values[:5])  # Next 5 unranked values
-    
-    # Ensure we have 10 values (pad with "Unknown" if needed)
-    while len(all_values) < 10:
-        all_values.append("Unknown")
-    
-    # Get descriptions and categories for all 10 values
-    descriptions = []
-    schwartz_categories = []
-    gouveia_categories = []
-    
-    for value in all_values:
-        desc, schwartz_cat, gouveia_cat = get_value_info(value)
-        descriptions.append(desc or "No description available")
-        schwartz_categories.append(schwartz_cat or "Unknown")
-        gouveia_categories.append(gouveia_cat or "Unknown")
-    
-    # Format the prompt using the section-specific template
-    prompt = section["prompt_template"].format(
-        # Top 5 ranked values
-        value1=all_values[0],
-        value2=all_values[1],
-        value3=all_values[2],
-        value4=all_values[3],
-        value5=all_values[4],
-        # Values 6-10 (unranked)
-        value6=all_values[5],
-        value7=all_values[6],
-        value8=all_values[7],
-        value9=all_values[8],
-        value10=all_values[9],
-        # Descriptions for all 10 values
-        desc1=descriptions[0],
-        desc2=descriptions[1],
-        desc3=descriptions[2],
-        desc4=descriptions[3],
-        desc5=descriptions[4],
-        desc6=descriptions[5],
-        desc7=descriptions[6],
-        desc8=descriptions[7],
-        desc9=descriptions[8],
-        desc10=descriptions[9],
-        # Schwartz categories for all 10 values
-        schwartz_cat1=schwartz_categories[0],
-        schwartz_cat2=schwartz_categories[1],
-        schwartz_cat3=schwartz_categories[2],
-        schwartz_cat4=schwartz_categories[3],
-        schwartz_cat5=schwartz_categories[4],
-        schwartz_cat6=schwartz_categories[5],
-        schwartz_cat7=schwartz_categories[6],
-        schwartz_cat8=schwartz_categories[7],
-        schwartz_cat9=schwartz_categories[8],
-        schwartz_cat10=schwartz_categories[9],
-        # Gouveia categories for all 10 values
-        gouveia_cat1=gouveia_categories[0],
-        gouveia_cat2=gouveia_categories[1],
-        gouveia_cat3=gouveia_categories[2],
-        gouveia_cat4=gouveia_categories[3],
-        gouveia_cat5=gouveia_categories[4],
-        gouveia_cat6=gouveia_categories[5],
-        gouveia_cat7=gouveia_categories[6],
-        gouveia_cat8=gouveia_categories[7],
-        gouveia_cat9=gouveia_categories[8],
-        gouveia_cat10=gouveia_categories[9],
-        # Personal information
-        age=user_data.get('age', 'Unknown'),
-        country=user_data.get('country', 'Unknown'),
-        occupation=user_data.get('occupation', 'Unknown')
-    )
-    
-    return prompt
+    if context is None:
+        context = prompt_builder.build_context(user_data)
+    
+    return prompt_builder.render(section, context)
 
-async def generate_content(user_data, section):
+async def generate_content(user_data, section, prompt=None, on_partial=None):
     """
     Generate content using Google Gemini for a specific report section
     
+    The Gemini call is made with the async client so that many sections, for
+    many reports, can be generated at the same time on one event loop. It goes
+    through the shared LLM scheduler, which applies the global rate limit and
+    concurrency cap and retries rate-limit and transient errors. The whole
+    call, retries and waits included, is given up on after
+    Config.LLM_SECTION_DEADLINE.
+    
     Args:
         user_data (dict): User's values and personal information
         section (dict): Report section data
+        prompt (str): Already rendered prompt for the section, if available
+        on_partial (callable): If given and Config.LLM_STREAMING is on, the
+            response is streamed and this is called with the text so far
         
     Returns:
         tuple: (success, content, prompt)
@@ -166,19 +89,41 @@ async def generate_content(user_data, section):
             - prompt (str): Prompt used for generation
     """
     try:
-        # Initialize model
-        model = initialize_model()
-        if not model:
-            return False, "Failed to initialize LLM model", ""
-        
         # Generate customized prompt
-        prompt = generate_prompt(user_data, section)
+        if prompt is None:
+            prompt = generate_prompt(user_data, section)
+        
+        # Reuse the response to an identical earlier request if caching is enabled
+        cache = get_response_cache()
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(section['title'], prompt, get_model_version())
+            cached = await asyncio.to_thread(cache.get, cache_key)
+            if cached is not None:
+                logger.info(f"Using cached response for section: {section['title']}")
+                return True, cached, prompt
+        
+        # Get the shared client
+        client = initialize_model()
+        if not client:
+            return False, "Failed to initialize LLM model", prompt
         
-        # Generate content
-        response = model.generate_content(prompt)
+        # Generate content through the scheduler
+        if not (on_partial and Config.LLM_STREAMING):
+            on_partial = None
+        try:
+            response = await asyncio.wait_for(
+                get_llm_scheduler().call(client.generate_async, prompt, on_partial=on_partial),
+                Config.LLM_SECTION_DEADLINE
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Section '{section['title']}' not generated within {Config.LLM_SECTION_DEADLINE}s")
+            return False, f"Timed out after {Config.LLM_SECTION_DEADLINE}s", prompt
         
         # Extract and return the generated text
         if response and hasattr(response, 'text'):
+            if cache:
+                await asyncio.to_thread(cache.set, cache_key, response.text)
             return True, response.text, prompt
         else:
             return False, "No content generated", prompt
@@ -187,27 +132,96 @@ async def generate_content(user_data, section):
         logger.error(f"Error generating content: {e}")
         return False, f"Error generating content: {str(e)}", ""
 
-async def generate_all_sections(user_data):
+async def _generate_section(user_data, section, prompt, semaphore, on_partial=None):
     """
-    Generate content for all report sections
+    Generate a single section, bounded by the per-report semaphore
     
     Args:
         user_data (dict): User's values and personal information
+        section (dict): Report section data
+        prompt (str): Rendered prompt for the section
+        semaphore (asyncio.Semaphore): Limits the number of sections in flight
+        on_partial (callable): Receives streamed text for the section, if any
+        
+    Returns:
+        tuple: (success, content, prompt)
+    """
+    async with semaphore:
+        return await generate_content(user_data, section, prompt, on_partial)
+
+async def generate_all_sections(user_data, completed_sections=None, on_section_complete=None,
+                                on_section_partial=None):
+    """
+    Generate content for all report sections concurrently
+    
+    Sections run in parallel up to Config.LLM_MAX_CONCURRENCY. Each attempt is
+    bounded by Config.LLM_SECTION_TIMEOUT and retried by the LLM scheduler,
+    and each section as a whole by Config.LLM_SECTION_DEADLINE. A
+    section that still fails does not affect the others; it is filled with a
+    placeholder so the report can still be built.
+    
+    Args:
+        user_data (dict): User's values and personal information
+        completed_sections (dict): Sections already generated for this report,
+            as {title: {'content': ..., 'prompt': ...}}; these are not regenerated
+        on_section_complete (callable): Coroutine function awaited with
+            (title, content, prompt) for every section that is generated successfully
+        on_section_partial (callable): Called with (title, text_so_far) while a
+            section is being streamed; may be called from a worker thread
         
     Returns:
         dict: Dictionary with section titles as keys and content as values
     """
     sections_content = {}
     prompts_used = {}
-    
+    completed_sections = completed_sections or {}
+    
+    pending = [s for s in Config.REPORT_SECTIONS if s['title'] not in completed_sections]
+    if len(pending) < len(Config.REPORT_SECTIONS):
+        logger.info(f"Reusing {len(Config.REPORT_SECTIONS) - len(pending)} previously generated sections")
+    
+    # Render the shared value blocks once and build every section prompt from them
+    context = prompt_builder.build_context(user_data)
+    semaphore = asyncio.Semaphore(max(1, Config.LLM_MAX_CONCURRENCY))
+    
+    async def run_section(section):
+        prompt = generate_prompt(user_data, section, context)
+        on_partial = None
+        if on_section_partial:
+            on_partial = functools.partial(on_section_partial, section['title'])
+        result = await _generate_section(user_data, section, prompt, semaphore, on_partial)
+        success, content, prompt = result
+        if success and on_section_complete:
+            try:
+                await on_section_complete(section['title'], content, prompt)
+            except Exception as e:
+                logger.error(f"Error saving section '{section['title']}': {e}")
+        return result
+    
+    results = await asyncio.gather(*[run_section(section) for section in pending])
+    generated = {section['title']: result for section, result in zip(pending, results)}
+    
+    failed_sections = []
     for section in Config.REPORT_SECTIONS:
-        success, content, prompt = await generate_content(user_data, section)
+        title = section['title']
+        if title in completed_sections:
+            sections_content[title] = completed_sections[title]['content']
+            prompts_used[title] = completed_sections[title]['prompt']
+            continue
         
+        success, content, prompt = generated[title]
         if success:
-            sections_content[section['title']] = content
-            prompts_used[section['title']] = prompt
+            sections_content[title] = content
+            prompts_used[title] = prompt
         else:
-            sections_content[section['title']] = "Content generation failed for this section."
-            prompts_used[section['title']] = prompt
+            sections_content[title] = FAILED_SECTION_TEXT
+            prompts_used[title] = prompt
+            failed_sections.append(title)
+    
+    if failed_sections:
+        logger.warning(
+            f"Generated {len(pending) - len(failed_sections)}/{len(pending)} sections; "
+            f"failed: {', '.join(failed_sections)}"
+        )
     
-    return sections_content, prompts_used
\ No newline at end of file
+    return sections_content, prompts_used
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+LLM call scheduler for the Values Report Bot
+
+All Gemini calls, across every report in progress, go through one scheduler.
+A token bucket keeps the request rate under the API quota, a global slot
+limit caps the number of requests in flight, and rate-limit or transient
+errors are retried with exponential backoff and jitter. Under a burst,
+requests wait for their turn instead of failing. Waiting is done with
+asyncio, so queued requests cost nothing but a suspended coroutine.
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from google.api_core import exceptions as google_exceptions
+from config import Config
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: rate limits, overloaded or unavailable backends and timeouts
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+class TokenBucket:
+    """Thread-safe token bucket handing out request slots in arrival order"""
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Maximum number of tokens (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, borrowing against future refills if none are left
+
+        Returns:
+            float: Seconds to wait before the reserved token may be used
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+class LLMScheduler:
+    """Rate-limited, concurrency-capped runner for async LLM calls with retries"""
+
+    def __init__(self, requests_per_minute, burst, max_concurrency, max_retries=5,
+                 base_delay=1.0, max_delay=30.0, attempt_timeout=None):
+        """
+        Args:
+            requests_per_minute (float): Sustained request rate
+            burst (int): Requests allowed at once before rate limiting applies
+            max_concurrency (int): Maximum requests in flight
+            max_retries (int): Retries after the first attempt for retryable errors
+            base_delay (float): Backoff before the first retry, in seconds
+            max_delay (float): Upper bound on a single backoff, in seconds
+            attempt_timeout (float): Seconds to wait for a single attempt, or None
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Call func under the rate limit and concurrency cap, retrying transient errors
+
+        Returns once the call succeeds, fails with a non-retryable error, or
+        runs out of retries.
+
+        Args:
+            func (callable): Coroutine function making the LLM call
+            *args, **kwargs: Arguments passed to func
+
+        Returns:
+            The return value of func
+
+        Raises:
+            Exception: The last error raised by func
+        """
+        attempt = 0
+        while True:
+            wait = self._bucket.reserve()
+            if wait > 0:
+                metrics.record_timing('llm_scheduler.rate_limit_wait', wait)
+                await asyncio.sleep(wait)
+
+            try:
+                return await self._attempt(func, args, kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    metrics.increment('llm_scheduler.exhausted')
+                    logger.error(f"LLM call failed after {attempt + 1} attempts: {e}")
+                    raise
+
+                # Full jitter: sleep a random time up to the exponential backoff
+                backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                metrics.increment('llm_scheduler.retries')
+                logger.warning(
+                    f"Retryable LLM error ({type(e).__name__}: {e}); "
+                    f"retry {attempt}/{self.max_retries} in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+
+    async def _attempt(self, func, args, kwargs):
+        """Run one attempt in a free slot, giving up on it after attempt_timeout"""
+        start = time.perf_counter()
+        async with self._slots:
+            metrics.record_timing('llm_scheduler.slot_wait', time.perf_counter() - start)
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), self.attempt_timeout)
+            except asyncio.TimeoutError:
+                metrics.increment('llm_scheduler.timeouts')
+                raise TimeoutError(f"LLM call timed out after {self.attempt_timeout}s")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_llm_scheduler():
+    """
+    Get the scheduler shared by all reports, creating it from Config on first use
+
+    Returns:
+        LLMScheduler: The shared scheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    Config.LLM_REQUESTS_PER_MINUTE,
+                    Config.LLM_BURST,
+                    Config.LLM_GLOBAL_CONCURRENCY,
+                    max_retries=Config.LLM_MAX_RETRIES,
+                    base_delay=Config.LLM_RETRY_BASE_DELAY,
+                    max_delay=Config.LLM_RETRY_MAX_DELAY,
+                    attempt_timeout=Config.LLM_SECTION_TIMEOUT
+                )
+    return _scheduler
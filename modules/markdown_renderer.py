@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Markdown rendering for report sections
+
+Converters are built once with the report's extensions and kept in a pool,
+so rendering a section doesn't reload the extensions. Output is memoized by
+content hash, so identical sections (e.g. LLM responses served from the
+cache) are only converted once. Sanitizing happens inside the conversion:
+raw HTML in the model output is escaped rather than passed through, and
+links or images with script URLs and event-handler attributes are removed.
+"""
+
+import re
+import queue
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import markdown
+from markdown.treeprocessors import Treeprocessor
+from config import Config
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_EXTENSIONS = ['extra', 'nl2br', 'sane_lists']
+
+# URL schemes that are never allowed in links or images
+UNSAFE_URL_SCHEMES = ('javascript:', 'vbscript:', 'data:')
+URL_ATTRIBUTES = ('href', 'src')
+_IGNORED_URL_CHARS = re.compile(r'[\s\x00-\x1f]+')
+
+def is_safe_url(url):
+    """
+    Check whether a URL is safe to keep in a link or image
+
+    Args:
+        url (str): URL from the rendered markdown
+
+    Returns:
+        bool: False for javascript:, vbscript: and data: URLs, including
+              ones obscured with whitespace, control characters or case
+    """
+    normalized = _IGNORED_URL_CHARS.sub('', url).lower()
+    return not normalized.startswith(UNSAFE_URL_SCHEMES)
+
+class SanitizeTreeprocessor(Treeprocessor):
+    """Remove unsafe URLs and event-handler attributes from the element tree"""
+
+    def run(self, root):
+        for element in root.iter():
+            for name in list(element.attrib):
+                if name.lower().startswith('on'):
+                    del element.attrib[name]
+                elif name in URL_ATTRIBUTES and not is_safe_url(element.attrib[name]):
+                    element.attrib[name] = ''
+                    metrics.increment('markdown.unsafe_urls')
+
+class MarkdownRenderer:
+    """Thread-safe markdown to HTML renderer with a converter pool and output cache"""
+
+    def __init__(self, extensions=None, pool_size=4, cache_entries=512, sanitize=True):
+        """
+        Args:
+            extensions (list): Markdown extensions for every converter
+            pool_size (int): Maximum number of idle converters kept for reuse
+            cache_entries (int): Rendered outputs kept in memory (0 disables)
+            sanitize (bool): Escape raw HTML and strip unsafe URLs and attributes
+        """
+        self.extensions = extensions or MARKDOWN_EXTENSIONS
+        self.cache_entries = cache_entries
+        self.sanitize = sanitize
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create_converter(self):
+        """Build a converter with the configured extensions"""
+        converter = markdown.Markdown(extensions=self.extensions)
+        if self.sanitize:
+            # Raw HTML blocks and inline tags are escaped instead of passed through
+            converter.preprocessors.deregister('html_block')
+            converter.inlinePatterns.deregister('html')
+            # Runs last, after attribute lists and unescaping
+            converter.treeprocessors.register(SanitizeTreeprocessor(converter), 'sanitize', -1)
+        metrics.increment('markdown.converters_created')
+        return converter
+
+    def _acquire(self):
+        """Take an idle converter from the pool, or build a new one"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._create_converter()
+
+    def _release(self, converter):
+        """Reset a converter and return it to the pool if there is room"""
+        converter.reset()
+        try:
+            self._pool.put_nowait(converter)
+        except queue.Full:
+            pass
+
+    def render(self, text):
+        """
+        Convert markdown to HTML
+
+        Args:
+            text (str): Markdown source
+
+        Returns:
+            str: Rendered (and, if enabled, sanitized) HTML
+        """
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                metrics.increment('markdown.cache_hits')
+                return html
+
+        converter = self._acquire()
+        try:
+            html = converter.convert(text)
+        finally:
+            self._release(converter)
+        metrics.increment('markdown.cache_misses')
+
+        if self.cache_entries > 0:
+            with self._lock:
+                self._cache[key] = html
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return html
+
+# Shared renderer used by the report generator
+markdown_renderer = MarkdownRenderer(
+    pool_size=Config.REPORT_WORKERS,
+    cache_entries=Config.MARKDOWN_CACHE_ENTRIES
+)
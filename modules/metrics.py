@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Lightweight in-process metrics for the Values Report Bot
+
+Counters and timings are kept in memory and can be read with snapshot(),
+for example to log them periodically or on shutdown.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+_values = {}
+
+def increment(name, amount=1):
+    """
+    Add to a counter
+
+    Args:
+        name (str): Counter name
+        amount (int): Amount to add
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def record_timing(name, seconds):
+    """
+    Record a duration
+
+    Args:
+        name (str): Timing name
+        seconds (float): Measured duration in seconds
+    """
+    with _lock:
+        _observe(_timings, name, seconds)
+
+def record_value(name, value):
+    """
+    Record a measurement that is not a duration (e.g. a size in bytes)
+
+    Args:
+        name (str): Measurement name
+        value (float): Measured value
+    """
+    with _lock:
+        _observe(_values, name, value)
+
+def _observe(series, name, value):
+    """Add a value to a count/total/max summary (caller holds the lock)"""
+    summary = series.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+    summary['count'] += 1
+    summary['total'] += value
+    summary['max'] = max(summary['max'], value)
+
+def _summaries(series):
+    """Copy summaries, adding their averages (caller holds the lock)"""
+    return {
+        name: dict(summary, avg=summary['total'] / summary['count'] if summary['count'] else 0.0)
+        for name, summary in series.items()
+    }
+
+@contextmanager
+def timed(name):
+    """Context manager recording the duration of its block under name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def snapshot():
+    """
+    Get a copy of all metrics
+
+    Returns:
+        dict: {'counters': {name: value}, 'timings': {name: {count, total, max, avg}},
+               'values': {name: {count, total, max, avg}}}
+    """
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'timings': _summaries(_timings),
+            'values': _summaries(_values)
+        }
+
+def log_snapshot():
+    """Write the current metrics to the log"""
+    data = snapshot()
+    for name, value in sorted(data['counters'].items()):
+        logger.info(f"{name}: {value}")
+    for name, timing in sorted(data['timings'].items()):
+        logger.info(
+            f"{name}: count={timing['count']} avg={timing['avg'] * 1000:.1f}ms "
+            f"max={timing['max'] * 1000:.1f}ms"
+        )
+    for name, summary in sorted(data['values'].items()):
+        logger.info(f"{name}: count={summary['count']} avg={summary['avg']:.1f} max={summary['max']:.1f}")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PDF rendering for the Values Report Bot
+
+Reports are converted to PDF with WeasyPrint in a pool of worker processes.
+Each worker loads the Poppins fonts from static/fonts and renders a small
+warm-up document when it starts, so the first real report doesn't pay for
+font loading. Workers never fetch anything over the network (the Google
+Fonts stylesheet in the template is ignored), and each one runs under an
+address-space limit. A job that exceeds its timeout, or crashes its worker,
+causes the pool to be replaced.
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+from modules import metrics
+from modules.fonts import FONT_DIR, POPPINS_FACES
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; workers run without a memory cap
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Styles added on top of the template when rendering to paper
+PDF_PAGE_CSS = """
+@page { size: A4; margin: 0; }
+body { max-width: none; }
+"""
+
+WARM_UP_HTML = "<p style=\"font-family: 'Poppins'\">Warm-up <b>bold</b> <i>italic</i></p>"
+
+class PDFRenderError(Exception):
+    """Raised when a report cannot be converted to PDF"""
+
+def font_face_css(font_dir=FONT_DIR):
+    """
+    Build @font-face rules pointing at the local Poppins files
+
+    Args:
+        font_dir (str): Directory containing the Poppins TTF files
+
+    Returns:
+        str: CSS with one @font-face rule per available face
+    """
+    rules = []
+    for file_name, weight, style in POPPINS_FACES:
+        path = os.path.join(font_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        rules.append(
+            "@font-face { font-family: 'Poppins'; "
+            f"src: url('file://{path}'); font-weight: {weight}; font-style: {style}; }}"
+        )
+    return "\n".join(rules)
+
+# Per-process state, set up by _init_worker in each worker process
+_worker = {}
+
+def _url_fetcher(url, timeout=10, ssl_context=None):
+    """
+    Fetch resources for WeasyPrint without touching the network
+
+    data: URIs (the embedded images) and the local font files are allowed;
+    anything else, such as the Google Fonts stylesheet, is replaced with an
+    empty response.
+    """
+    from weasyprint import default_url_fetcher
+
+    if url.startswith('data:') or url.startswith(f"file://{FONT_DIR}"):
+        return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+    return {'string': b'', 'mime_type': 'text/css'}
+
+def _init_worker(memory_limit_mb):
+    """Cap the worker's memory, load the fonts and render a warm-up document"""
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    stylesheets = [
+        CSS(string=font_face_css(), font_config=font_config, url_fetcher=_url_fetcher),
+        CSS(string=PDF_PAGE_CSS, font_config=font_config)
+    ]
+    _worker.update(html_class=HTML, font_config=font_config, stylesheets=stylesheets)
+    _render(WARM_UP_HTML)
+
+def _render(html):
+    """Convert HTML to PDF bytes in a worker process"""
+    document = _worker['html_class'](string=html, url_fetcher=_url_fetcher)
+    return document.write_pdf(stylesheets=_worker['stylesheets'], font_config=_worker['font_config'])
+
+def _ping():
+    """No-op task used to start workers ahead of the first job"""
+    return os.getpid()
+
+class PDFRenderer:
+    """Pool of pre-warmed WeasyPrint worker processes"""
+
+    def __init__(self, workers=2, timeout=60, memory_limit_mb=1024):
+        """
+        Args:
+            workers (int): Number of worker processes
+            timeout (float): Seconds a single render may take
+            memory_limit_mb (int): Address-space limit per worker (0 for none)
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Get the current pool, creating it if needed"""
+        with self._lock:
+            if self._executor is None:
+                # spawn avoids forking a process that is running bot threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,)
+                )
+            return self._executor
+
+    def start(self):
+        """Start and warm up all workers now rather than on the first report"""
+        start = time.perf_counter()
+        executor = self._get_executor()
+        futures = [executor.submit(_ping) for _ in range(self.workers)]
+        try:
+            pids = {future.result(timeout=self.timeout) for future in futures}
+        except (BrokenProcessPool, FutureTimeoutError) as e:
+            self._reset(executor)
+            raise PDFRenderError(f"PDF workers failed to start (is WeasyPrint installed?): {e!r}")
+        logger.info(f"PDF workers ready: {len(pids)} in {time.perf_counter() - start:.1f}s")
+
+    def _reset(self, executor):
+        """Discard a pool whose worker hung or died; the next job starts a new one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        metrics.increment('pdf.pool_resets')
+
+    def render(self, html):
+        """
+        Convert a rendered report to PDF
+
+        Args:
+            html (str): Report HTML
+
+        Returns:
+            bytes: PDF document
+
+        Raises:
+            PDFRenderError: If the job times out, its worker dies or rendering fails
+        """
+        executor = self._get_executor()
+        start = time.perf_counter()
+        future = executor.submit(_render, html)
+        try:
+            pdf = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            metrics.increment('pdf.timeouts')
+            self._reset(executor)
+            raise PDFRenderError(f"PDF rendering timed out after {self.timeout}s")
+        except BrokenProcessPool as e:
+            metrics.increment('pdf.worker_crashes')
+            self._reset(executor)
+            raise PDFRenderError(f"PDF worker died: {e}")
+        except MemoryError:
+            metrics.increment('pdf.memory_errors')
+            raise PDFRenderError(f"PDF rendering exceeded the {self.memory_limit_mb} MB memory limit")
+        except Exception as e:
+            raise PDFRenderError(f"PDF rendering failed: {e}")
+
+        metrics.record_timing('pdf.render', time.perf_counter() - start)
+        metrics.record_value('pdf.bytes', len(pdf))
+        return pdf
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+def get_pdf_renderer():
+    """
+    Get the shared PDF renderer, creating it from Config on first use
+
+    Returns:
+        PDFRenderer: The shared renderer
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PDFRenderer(
+                    workers=Config.PDF_WORKERS,
+                    timeout=Config.PDF_TIMEOUT,
+                    memory_limit_mb=Config.PDF_MEMORY_LIMIT_MB
+                )
+    return _renderer
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Prompt builder for the Values Report Bot
+
+The section prompt templates in Config.REPORT_SECTIONS are compiled once at
+import. Compiling checks every placeholder against the known prompt fields,
+so a typo in a template is reported at startup instead of as a KeyError in
+the middle of a report. The value lists and descriptor blocks that the
+templates have in common are rendered once per user and reused by every
+section prompt.
+"""
+
+import logging
+import threading
+from string import Formatter
+from config import Config
+from modules.value_catalog import get_value_profile, PROFILE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Placeholders available to prompt templates
+PROMPT_FIELDS = frozenset(
+    [f"value{i}" for i in range(1, PROFILE_SIZE + 1)]
+    + [f"desc{i}" for i in range(1, PROFILE_SIZE + 1)]
+    + [f"schwartz_cat{i}" for i in range(1, PROFILE_SIZE + 1)]
+    + [f"gouveia_cat{i}" for i in range(1, PROFILE_SIZE + 1)]
+    + ["age", "country", "occupation"]
+)
+
+def _value_lines(field_prefix):
+    """Template text listing every value with one of its attributes"""
+    return "\n".join(
+        f"- {{value{i}}}: {{{field_prefix}{i}}}" for i in range(1, PROFILE_SIZE + 1)
+    )
+
+# Blocks of template text shared by several sections, rendered once per user
+SHARED_BLOCKS = {
+    'ranked_values': (
+        "My top five values in ranked order from 1st to 5th are "
+        "{value1}, {value2}, {value3}, {value4}, and {value5}."
+    ),
+    'subsequent_values': (
+        "My subsequent five values in no particular ranked order are "
+        "{value6}, {value7}, {value8}, {value9}, and {value10}."
+    ),
+    'descriptors': _value_lines("desc"),
+    'schwartz_categories': _value_lines("schwartz_cat"),
+    'gouveia_categories': _value_lines("gouveia_cat"),
+}
+
+class PromptTemplateError(ValueError):
+    """Raised when a prompt template uses an unknown or unsupported placeholder"""
+
+class CompiledPrompt:
+    """A prompt template split into literal text, fields and shared blocks"""
+
+    def __init__(self, name, template, blocks=None):
+        """
+        Args:
+            name (str): Name used in error messages (usually the section title)
+            template (str): str.format-style template text
+            blocks (dict): Shared blocks to substitute, as {block_name: block_text}
+
+        Raises:
+            PromptTemplateError: If the template contains an invalid placeholder
+        """
+        self.name = name
+        self.segments = []
+
+        # Split out the shared blocks first, then parse the remaining text
+        pieces = [('text', template)]
+        for block_name, block_text in (blocks or {}).items():
+            split_pieces = []
+            for kind, payload in pieces:
+                if kind != 'text' or block_text not in payload:
+                    split_pieces.append((kind, payload))
+                    continue
+                parts = payload.split(block_text)
+                for index, part in enumerate(parts):
+                    if index:
+                        split_pieces.append(('block', block_name))
+                    split_pieces.append(('text', part))
+            pieces = split_pieces
+
+        for kind, payload in pieces:
+            if kind == 'block':
+                self.segments.append((kind, payload))
+            else:
+                self.segments.extend(self._parse(payload))
+
+    @property
+    def fields(self):
+        """Names of the fields used directly by this template"""
+        return {payload for kind, payload in self.segments if kind == 'field'}
+
+    @property
+    def blocks(self):
+        """Names of the shared blocks used by this template"""
+        return {payload for kind, payload in self.segments if kind == 'block'}
+
+    def render(self, fields, blocks=None):
+        """
+        Render the template
+
+        Args:
+            fields (dict): Values for the template fields
+            blocks (dict): Rendered shared blocks
+
+        Returns:
+            str: The rendered text
+        """
+        rendered = []
+        for kind, payload in self.segments:
+            if kind == 'text':
+                rendered.append(payload)
+            elif kind == 'field':
+                rendered.append(str(fields[payload]))
+            else:
+                rendered.append(blocks[payload])
+        return "".join(rendered)
+
+    def _parse(self, text):
+        """Split text into literal and field segments, validating the fields"""
+        segments = []
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            raise PromptTemplateError(f"Invalid prompt template '{self.name}': {e}") from e
+
+        for literal, field_name, format_spec, conversion in parsed:
+            if literal:
+                segments.append(('text', literal))
+            if field_name is None:
+                continue
+            if field_name not in PROMPT_FIELDS:
+                raise PromptTemplateError(
+                    f"Unknown placeholder '{{{field_name}}}' in prompt template '{self.name}'"
+                )
+            if format_spec or conversion:
+                raise PromptTemplateError(
+                    f"Unsupported format options on '{{{field_name}}}' in prompt template '{self.name}'"
+                )
+            segments.append(('field', field_name))
+        return segments
+
+class PromptContext:
+    """Per-user prompt fields with the shared blocks already rendered"""
+
+    def __init__(self, fields, blocks):
+        self.fields = fields
+        self.blocks = blocks
+
+class PromptBuilder:
+    """Compiles section prompt templates once and renders them per user"""
+
+    def __init__(self, sections):
+        """
+        Args:
+            sections (list): Report sections in the format of Config.REPORT_SECTIONS
+
+        Raises:
+            PromptTemplateError: If any template contains an invalid placeholder
+        """
+        self._lock = threading.Lock()
+        self._blocks = {
+            name: CompiledPrompt(f"shared block {name}", text)
+            for name, text in SHARED_BLOCKS.items()
+        }
+        self._templates = {}
+        for section in sections:
+            self._templates[section['title']] = self._compile(section)
+        logger.info(f"Compiled {len(self._templates)} prompt templates")
+
+    def build_context(self, user_data):
+        """
+        Build the prompt fields for a user and render the shared blocks once
+
+        Args:
+            user_data (dict): User's values and personal information
+
+        Returns:
+            PromptContext: Context to pass to render()
+        """
+        profile = get_value_profile(user_data)
+
+        fields = {
+            'age': user_data.get('age', 'Unknown'),
+            'country': user_data.get('country', 'Unknown'),
+            'occupation': user_data.get('occupation', 'Unknown')
+        }
+        for i, entry in enumerate(profile[:PROFILE_SIZE], 1):
+            fields[f"value{i}"] = entry['value']
+            fields[f"desc{i}"] = entry['description']
+            fields[f"schwartz_cat{i}"] = entry['schwartz_category']
+            fields[f"gouveia_cat{i}"] = entry['gouveia_category']
+
+        blocks = {name: block.render(fields) for name, block in self._blocks.items()}
+        return PromptContext(fields, blocks)
+
+    def render(self, section, context):
+        """
+        Render the prompt for a report section
+
+        Args:
+            section (dict): Report section data
+            context (PromptContext): Context from build_context()
+
+        Returns:
+            str: Prompt for the LLM
+        """
+        template = self._templates.get(section['title'])
+        if template is None:
+            # Sections outside Config.REPORT_SECTIONS are compiled on first use
+            with self._lock:
+                template = self._templates.get(section['title'])
+                if template is None:
+                    template = self._templates[section['title']] = self._compile(section)
+        return template.render(context.fields, context.blocks)
+
+    def _compile(self, section):
+        """Compile the prompt template of a section"""
+        return CompiledPrompt(section['title'], section['prompt_template'], SHARED_BLOCKS)
+
+# Prompt builder for the configured report sections, compiled at import
+prompt_builder = PromptBuilder(Config.REPORT_SECTIONS)
@@ -6,38 +6,111 @@ Report Generator module using Jinja2 templates with markdown support
 """
 
 import os
+import re
 import logging
-import base64
 from datetime import datetime
 import tempfile
-from jinja2 import Environment, FileSystemLoader
-import markdown
+from html import unescape
+import threading
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from config import Config
+from modules.value_catalog import get_value_profile
+from modules.assets import asset_cache, recompress_png, ImageOptimizer
+from modules.markdown_renderer import markdown_renderer
+from modules.pdf_renderer import get_pdf_renderer
+from modules.fonts import font_subsetter
+from modules import metrics
 
 logger = logging.getLogger(__name__)
 
-# Initialize Jinja2 environment
 template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
-env = Environment(loader=FileSystemLoader(template_dir))
+REPORT_TEMPLATE = 'report_template.html'
 
-def get_base64_logo():
+# Rendered in place of the font CSS, which depends on the report's characters
+FONT_FACES_PLACEHOLDER = '__REPORT_FONT_FACES__'
+
+def _create_environment():
     """
-    Convert logo to base64 for embedding in HTML
+    Build the Jinja2 environment
+    
+    Compiled templates are cached on disk so a cold start skips compilation.
+    Templates are only checked for changes in hot-reload mode (development).
+    """
+    bytecode_cache = None
+    if Config.TEMPLATE_CACHE_DIR:
+        try:
+            os.makedirs(Config.TEMPLATE_CACHE_DIR, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(Config.TEMPLATE_CACHE_DIR)
+        except OSError as e:
+            logger.warning(f"Template bytecode cache disabled: {e}")
+    
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        auto_reload=Config.TEMPLATE_HOT_RELOAD,
+        bytecode_cache=bytecode_cache
+    )
+
+# Initialize Jinja2 environment
+env = _create_environment()
+
+_report_template = None
+_template_lock = threading.Lock()
+
+def get_report_template():
+    """
+    Get the compiled report template
+    
+    The template is loaded once and reused. In hot-reload mode it is fetched
+    from the environment each time, which recompiles it if the file changed.
     
     Returns:
-        str: base64 encoded image string with data URI prefix
+        jinja2.Template: The report template
     """
-    # Path to your logo file in your project
-    logo_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images', 'logo.png')
+    global _report_template
+    if Config.TEMPLATE_HOT_RELOAD:
+        return env.get_template(REPORT_TEMPLATE)
+    if _report_template is None:
+        with _template_lock:
+            if _report_template is None:
+                with metrics.timed('report.template_load'):
+                    _report_template = env.get_template(REPORT_TEMPLATE)
+    return _report_template
+
+# Static images embedded in every report
+static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+LOGO_PATH = os.path.join(static_dir, 'images', 'logo.png')
+REFERENCE_IMAGE_PATH = os.path.join(static_dir, 'images', 'reference.png')
+
+def _asset_transform(max_width):
+    """Return the transform applied to an embedded image, if any"""
+    if Config.REPORT_IMAGE_FORMAT in ('webp', 'png'):
+        return ImageOptimizer(max_width, Config.REPORT_IMAGE_FORMAT, Config.REPORT_IMAGE_QUALITY)
+    return recompress_png if Config.ASSET_RECOMPRESS else None
+
+def _embed_image(path, name, max_width):
+    """
+    Get the data URI for an image from the asset cache
     
+    Returns:
+        tuple: (data_uri, bytes_saved) where bytes_saved is the size of the
+               encoding that was served from the cache instead of rebuilt
+    """
     try:
-        with open(logo_path, 'rb') as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            return f"data:image/png;base64,{encoded_string}"
+        asset, hit = asset_cache.fetch(path, transform=_asset_transform(max_width))
+        return asset.data_uri, asset.encoded_size if hit else 0
     except Exception as e:
-        logger.error(f"Error encoding logo: {e}")
-        # Return empty string or a placeholder if logo can't be found
-        return ""
+        logger.error(f"Error encoding {name}: {e}")
+        # Return empty string or a placeholder if the image can't be found
+        return "", 0
+
+def get_base64_logo():
+    """
+    Convert logo to base64 for embedding in HTML
+    
+    Returns:
+        str: base64 encoded image string with data URI prefix
+    """
+    return _embed_image(LOGO_PATH, "logo", Config.REPORT_LOGO_MAX_WIDTH)[0]
     
 def get_base64_reference_image():
     """
@@ -46,39 +119,107 @@ def get_base64_reference_image():
     Returns:
         str: base64 encoded image string with data URI prefix
     """
-    # Path to your reference image file in your project
-    image_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images', 'reference.png')
+    return _embed_image(REFERENCE_IMAGE_PATH, "reference image", Config.REPORT_IMAGE_MAX_WIDTH)[0]
+
+# Elements whose whitespace is significant and must not be minified
+_PRESERVED_BLOCK = re.compile(r'<(pre|textarea|script)\b.*?</\1>', re.IGNORECASE | re.DOTALL)
+_STYLE_BLOCK = re.compile(r'(<style\b[^>]*>)(.*?)(</style>)', re.IGNORECASE | re.DOTALL)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+_BLOCK_TAG = re.compile(
+    r'\s*(</?(?:html|head|body|meta|link|title|style|div|p|ul|ol|li|h[1-6]|header|footer|'
+    r'section|table|thead|tbody|tr|td|th|blockquote|hr)\b[^>]*>)\s*',
+    re.IGNORECASE
+)
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = _CSS_COMMENT.sub('', css)
+    css = _WHITESPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r'\1', css)
+    return css.replace(': ', ':').replace(';}', '}').strip()
+
+def minify_html(html):
+    """
+    Strip comments and redundant whitespace from a rendered report
     
-    try:
-        with open(image_path, 'rb') as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            return f"data:image/png;base64,{encoded_string}"
-    except Exception as e:
-        logger.error(f"Error encoding reference image: {e}")
-        return ""
+    Whitespace next to block-level tags is removed, and other runs of
+    whitespace are collapsed to a single space, which browsers render the
+    same way. <pre>, <textarea> and <script> contents are left untouched.
+    
+    Args:
+        html (str): Rendered HTML
+        
+    Returns:
+        str: Minified HTML
+    """
+    preserved = []
+    
+    def preserve(text):
+        preserved.append(text)
+        return f"\x00{len(preserved) - 1}\x00"
+    
+    html = _PRESERVED_BLOCK.sub(lambda m: preserve(m.group(0)), html)
+    html = _STYLE_BLOCK.sub(lambda m: preserve(m.group(1) + minify_css(m.group(2)) + m.group(3)), html)
+    html = _HTML_COMMENT.sub('', html)
+    html = _WHITESPACE.sub(' ', html)
+    html = _BLOCK_TAG.sub(r'\1', html)
+    
+    return _PLACEHOLDER.sub(lambda m: preserved[int(m.group(1))], html).strip()
 
-def generate_report(user_data, sections_content):
+def preload_assets():
     """
-    Generate an HTML report based on user data and section content
+    Encode the embedded images, load the template and build the common font
+    subset (or, in PDF mode, start the PDF workers) at startup so the first
+    report doesn't pay for it
+    """
+    get_base64_logo()
+    get_base64_reference_image()
+    get_report_template()
+    if Config.REPORT_OUTPUT_FORMAT == 'pdf':
+        get_pdf_renderer().start()
+    elif Config.REPORT_EMBED_FONTS:
+        # Builds the subset most reports use (the base Latin-1 set only)
+        font_subsetter.font_face_css('')
+
+def generate_report(user_data, sections_content, output_format=None):
+    """
+    Generate an HTML or PDF report based on user data and section content
     
     Args:
         user_data (dict): User's values and personal information
         sections_content (dict): Content for each section of the report
+        output_format (str): 'html' or 'pdf'; defaults to REPORT_OUTPUT_FORMAT
         
     Returns:
-        tuple: (success, html_path or error_message)
+        tuple: (success, report or error_message) where report is a binary
+               file object positioned at the start of the document. It is held in
+               memory unless larger than REPORT_SPOOL_MAX_BYTES, in which case
+               it spills to an anonymous temporary file; the caller must close it.
     """
+    output_format = output_format or Config.REPORT_OUTPUT_FORMAT
     try:
         # Capitalize country name
         country = user_data.get('country', 'Not specified')
         capitalized_country = ' '.join(word.capitalize() for word in country.split())
         
-        # Capitalize values
-        top_values = user_data.get('top_values', [])[:5]
-        capitalized_top_values = [' '.join(word.capitalize() for word in value.split()) for value in top_values]
+        # Capitalize values from the resolved profile (padding entries are not shown)
+        top_count = len(user_data.get('top_values', [])[:5])
+        next_count = len(user_data.get('next_values', [])[:5])
+        value_profile = [
+            dict(entry, value=' '.join(word.capitalize() for word in entry['value'].split()))
+            for entry in get_value_profile(user_data)
+        ]
+        capitalized_top_values = [entry['value'] for entry in value_profile[:top_count]]
+        capitalized_next_values = [entry['value'] for entry in value_profile[top_count:top_count + next_count]]
         
-        next_values = user_data.get('next_values', [])[:5]
-        capitalized_next_values = [' '.join(word.capitalize() for word in value.split()) for value in next_values]
+        # Embedded images come from the asset cache
+        logo_base64, logo_saved = _embed_image(LOGO_PATH, "logo", Config.REPORT_LOGO_MAX_WIDTH)
+        reference_image, reference_saved = _embed_image(REFERENCE_IMAGE_PATH, "reference image", Config.REPORT_IMAGE_MAX_WIDTH)
+        metrics.record_value('report.asset_bytes_saved', logo_saved + reference_saved)
         
         # Prepare template data
         template_data = {
@@ -86,12 +227,15 @@ def generate_report(user_data, sections_content):
             'generation_date': datetime.now().strftime('%B %d, %Y'),
             'top_values': capitalized_top_values,
             'next_values': capitalized_next_values,
+            'value_profile': value_profile,
             'age': user_data.get('age', 'Not specified'),
             'country': capitalized_country,
             'occupation': user_data.get('occupation', 'Not specified'),
             'sections': [],
-            'logo_base64': get_base64_logo(),
-            'reference_image': get_base64_reference_image()
+            'logo_base64': logo_base64,
+            'reference_image': reference_image,
+            # PDF workers load the full fonts themselves
+            'font_faces': FONT_FACES_PLACEHOLDER if Config.REPORT_EMBED_FONTS and output_format != 'pdf' else ''
         }
         
         # Format sections with markdown conversion
@@ -99,43 +243,44 @@ def generate_report(user_data, sections_content):
             section_title = section['title']
             raw_content = sections_content.get(section_title, 'Content not available')
             
-            # Convert markdown to HTML
-            html_content = markdown.markdown(
-                raw_content,
-                extensions=['extra', 'nl2br', 'sane_lists']
-            )
+            # Convert markdown to sanitized HTML
+            html_content = markdown_renderer.render(raw_content)
             
             template_data['sections'].append({
                 'title': section_title,
                 'content': html_content
             })
         
-        # Load template
-        template = env.get_template('report_template.html')
-        
         # Render template
-        html_content = template.render(**template_data)
+        with metrics.timed('report.render'):
+            html_content = get_report_template().render(**template_data)
+        if output_format == 'pdf':
+            document = get_pdf_renderer().render(html_content)
+        else:
+            if Config.REPORT_MINIFY:
+                html_content = minify_html(html_content)
+            if FONT_FACES_PLACEHOLDER in html_content:
+                font_faces = font_subsetter.font_face_css(unescape(html_content))
+                html_content = html_content.replace(FONT_FACES_PLACEHOLDER, font_faces, 1)
+            document = html_content.encode('utf-8')
         
-        # Create temporary file for HTML
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.html') as html_tmp:
-            html_path = html_tmp.name
-            html_tmp.write(html_content.encode('utf-8'))
+        # Hold the report in memory, spilling to disk only if it is unusually large
+        report_size = len(document)
+        report = tempfile.SpooledTemporaryFile(max_size=Config.REPORT_SPOOL_MAX_BYTES, suffix=f'.{output_format}')
+        report.write(document)
+        report.seek(0)
+        if report_size > Config.REPORT_SPOOL_MAX_BYTES:
+            metrics.increment('report.spilled_to_disk')
         
-        logger.info(f"HTML report generated successfully at {html_path}")
+        metrics.record_value('report.bytes', report_size)
+        if report_size > Config.REPORT_TARGET_BYTES:
+            logger.warning(
+                f"Report size {report_size} bytes exceeds the {Config.REPORT_TARGET_BYTES} byte target"
+            )
+        logger.info(f"{output_format.upper()} report generated successfully ({report_size} bytes)")
         
-        return True, html_path
+        return True, report
     
     except Exception as e:
-        logger.error(f"Error generating HTML report: {e}", exc_info=True)
+        logger.error(f"Error generating {output_format.upper()} report: {e}", exc_info=True)
         return False, f"Error generating report: {str(e)}"
-
-def cleanup_report(report_path):
-    """
-    Remove the temporary report file after it has been sent
-    """
-    try:
-        if os.path.exists(report_path):
-            os.unlink(report_path)
-            logger.info(f"Temporary report file removed: {report_path}")
-    except Exception as e:
-        logger.error(f"Error removing temporary report file: {e}")
\ No newline at end of file
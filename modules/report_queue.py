@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Report job queue for the Values Report Bot
+
+Report generation is slow (several LLM calls, rendering and an upload), so it
+runs as background tasks on the bot's event loop, at most max_workers at a
+time, instead of inside the update handlers. The queue keeps track of
+waiting jobs so users can be told their position in line when they submit,
+and refuses new jobs once it is full.
+"""
+
+import asyncio
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ReportQueue:
+    """Bounded set of report tasks that start in submission order"""
+
+    def __init__(self, max_workers, max_pending):
+        """
+        Args:
+            max_workers (int): Number of reports generated at the same time
+            max_pending (int): Maximum number of jobs waiting for a worker
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._waiting = []
+        self._running = set()
+        self._tasks = {}
+
+    def submit(self, job_id, func, *args, on_start=None):
+        """
+        Queue a report job; must be called from the event loop
+
+        Args:
+            job_id (str): Unique identifier of the job
+            func (callable): Coroutine function performing the job
+            *args: Arguments passed to func
+            on_start (callable): Optional coroutine function awaited when the job starts
+
+        Returns:
+            int: Position in line (1 is next to start, 0 if it starts right away),
+                 or None if the queue is full
+        """
+        position = max(len(self._waiting) + len(self._running) - self.max_workers + 1, 0)
+        if position > self.max_pending:
+            logger.warning(f"Report queue full, rejecting job {job_id}")
+            return None
+        self._waiting.append(job_id)
+
+        task = asyncio.create_task(self._run(job_id, func, args, on_start), name=f"report-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        logger.info(f"Report job {job_id} queued at position {position}")
+        return position
+
+    def stats(self):
+        """Return the current number of waiting and running jobs"""
+        return {
+            'waiting': len(self._waiting),
+            'running': len(self._running),
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending
+        }
+
+    async def shutdown(self, wait=True, timeout=None):
+        """
+        Wait for queued jobs to finish, or cancel them
+
+        Args:
+            wait (bool): Wait for jobs at all; if False every job is cancelled
+            timeout (float): If set, cancel jobs that have not started yet and
+                             give running ones this many seconds before
+                             cancelling them too
+        """
+        if not wait:
+            self._cancel(self._tasks.values())
+        elif timeout is not None:
+            self._cancel(self._tasks[job_id] for job_id in self._waiting if job_id in self._tasks)
+            running = list(self._tasks.values())
+            if running:
+                _, unfinished = await asyncio.wait(running, timeout=timeout)
+                if unfinished:
+                    logger.warning(f"Cancelling {len(unfinished)} report job(s) still running after {timeout}s")
+                    self._cancel(unfinished)
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _cancel(self, tasks):
+        """Cancel tasks, logging how many"""
+        tasks = list(tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            logger.info(f"Cancelled {len(tasks)} report job(s)")
+
+    async def _run(self, job_id, func, args, on_start):
+        """Wait for a free slot and run a job, keeping the bookkeeping up to date"""
+        try:
+            async with self._slots:
+                self._waiting.remove(job_id)
+                self._running.add(job_id)
+                if on_start:
+                    await on_start()
+                await func(*args)
+        except Exception as e:
+            logger.error(f"Report job {job_id} failed: {e}", exc_info=True)
+        finally:
+            # Also covers jobs cancelled while still waiting
+            if job_id in self._waiting:
+                self._waiting.remove(job_id)
+            self._running.discard(job_id)
+
+# Shared queue used by the bot handlers
+report_queue = ReportQueue(Config.REPORT_WORKERS, Config.REPORT_QUEUE_MAX_PENDING)
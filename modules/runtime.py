@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Runtime tuning for the Values Report Bot
+
+The bot runs two separate pools. Conversation steps are handled by the
+application's update processor, which runs up to HANDLER_CONCURRENCY updates
+at once (one at a time per chat, so a user's messages are still handled in
+order). Report generation runs in the report queue with REPORT_WORKERS
+workers, so a long report never holds up a quick reply.
+
+python-telegram-bot starts a task for every update it takes off its update
+queue, so the processor also limits how many updates are taken off the queue
+before earlier ones finish. Past that limit updates stay in the bounded
+update queue; when that is full too, polling and the webhook server stop
+accepting updates until handlers catch up, and Telegram retries them later.
+A chat that sends more than HANDLER_MAX_PER_CHAT updates before the earlier
+ones are handled has the extra updates dropped (and is asked to slow down),
+so one flooding chat cannot tie up the pool.
+
+PoolMonitor periodically logs how busy each pool is and records the
+utilization in the metrics, which is what to look at when sizing instances.
+"""
+
+import asyncio
+import logging
+from telegram.ext import BaseUpdateProcessor
+from modules.report_queue import report_queue
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+class AdmissionQueue(asyncio.Queue):
+    """Update queue that only hands out an update once the processor can take another"""
+
+    def __init__(self, admission, maxsize=0):
+        """
+        Args:
+            admission (asyncio.Semaphore): Released by the processor as updates finish
+            maxsize (int): Updates the queue holds before producers wait (0 for no limit)
+        """
+        super().__init__(maxsize=maxsize)
+        self._admission = admission
+
+    async def get(self):
+        await self._admission.acquire()
+        try:
+            return await super().get()
+        except BaseException:
+            self._admission.release()
+            raise
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently across chats but in order within each chat"""
+
+    def __init__(self, max_concurrent_updates, max_in_flight=None, max_per_chat=10):
+        """
+        Args:
+            max_concurrent_updates (int): Updates handled at the same time
+            max_in_flight (int): Updates taken off the update queue but not
+                                 finished yet, running or waiting (default: twice
+                                 max_concurrent_updates)
+            max_per_chat (int): Updates one chat may have in flight before more are dropped
+        """
+        max_in_flight = max(max_in_flight or max_concurrent_updates * 2, max_concurrent_updates)
+        # The base class only caps updates in flight; handler slots and the
+        # per-chat order are managed in do_process_update
+        super().__init__(max_in_flight)
+        self.max_handlers = max_concurrent_updates
+        self.max_in_flight = max_in_flight
+        self.max_per_chat = max(1, max_per_chat)
+        self.active = 0
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._admission = None
+        self._chat_locks = {}
+        self._warned_chats = set()
+
+    def create_update_queue(self, maxsize=0):
+        """
+        Create the application's update queue, tied to this processor's in-flight limit
+
+        Args:
+            maxsize (int): Updates the queue holds (0 for no limit)
+
+        Returns:
+            AdmissionQueue: Queue to pass to ApplicationBuilder.update_queue()
+        """
+        self._admission = asyncio.Semaphore(self.max_in_flight)
+        return AdmissionQueue(self._admission, maxsize=max(0, maxsize))
+
+    async def do_process_update(self, update, coroutine):
+        """
+        Run an update's handlers once earlier updates from its chat are done and a slot is free
+
+        The chat's turn is awaited before taking a slot, so updates queued
+        behind one busy chat do not keep slots from other chats.
+
+        Args:
+            update (object): The update being processed
+            coroutine (Awaitable): Runs the handlers for the update
+        """
+        self.in_flight += 1
+        try:
+            chat = getattr(update, 'effective_chat', None)
+            if chat is None:
+                async with self._slots:
+                    await self._run(coroutine)
+                return
+
+            lock, waiters = self._chat_locks.get(chat.id, (None, 0))
+            if waiters >= self.max_per_chat:
+                coroutine.close()
+                self._dropped(update, chat.id, waiters)
+                return
+
+            if lock is None:
+                lock = asyncio.Lock()
+            self._chat_locks[chat.id] = (lock, waiters + 1)
+            try:
+                async with lock:
+                    async with self._slots:
+                        await self._run(coroutine)
+            finally:
+                lock, waiters = self._chat_locks[chat.id]
+                if waiters <= 1:
+                    del self._chat_locks[chat.id]
+                    self._warned_chats.discard(chat.id)
+                else:
+                    self._chat_locks[chat.id] = (lock, waiters - 1)
+        finally:
+            self.in_flight -= 1
+            if self._admission is not None:
+                self._admission.release()
+
+    async def _run(self, coroutine):
+        """Await a handler coroutine, counting it as active while it runs"""
+        self.active += 1
+        try:
+            await coroutine
+        finally:
+            self.active -= 1
+
+    def _dropped(self, update, chat_id, waiters):
+        """Record a dropped update and ask the chat to slow down (once per backlog)"""
+        metrics.increment('runtime.updates_dropped')
+        logger.warning(
+            f"Dropped update {getattr(update, 'update_id', None)} from chat {chat_id}: "
+            f"{waiters} already waiting"
+        )
+        if chat_id in self._warned_chats:
+            return
+        self._warned_chats.add(chat_id)
+        try:
+            bot = update.get_bot()
+        except RuntimeError:
+            return
+        asyncio.get_running_loop().create_task(_ask_to_slow_down(bot, chat_id))
+
+    async def initialize(self):
+        """Nothing to set up"""
+
+    async def shutdown(self):
+        """Nothing to clean up"""
+
+async def _ask_to_slow_down(bot, chat_id):
+    """Tell a chat that some of its messages were not handled"""
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text="⏳ You're sending messages faster than I can keep up, so I skipped some of them. "
+                 "Please wait for my reply before sending more."
+        )
+    except Exception as e:
+        logger.warning(f"Could not ask chat {chat_id} to slow down: {e}")
+
+class PoolMonitor:
+    """Periodically logs and records how busy the handler and report pools are"""
+
+    def __init__(self, application, interval=60.0):
+        """
+        Args:
+            application (Application): The running bot application
+            interval (float): Seconds between reports
+        """
+        self.application = application
+        self.interval = interval
+        self._task = None
+
+    def stats(self):
+        """
+        Get the current load of each pool
+
+        Returns:
+            dict: Active and maximum handlers, queued updates and report queue stats
+        """
+        processor = self.application.update_processor
+        update_queue = self.application.update_queue
+        return {
+            'handlers_active': getattr(processor, 'active', 0),
+            'handlers_max': getattr(processor, 'max_handlers', processor.max_concurrent_updates),
+            'updates_in_flight': getattr(processor, 'in_flight', 0),
+            'updates_queued': update_queue.qsize(),
+            'update_queue_max': update_queue.maxsize,
+            'reports': report_queue.stats()
+        }
+
+    def record(self):
+        """Log the current load and add it to the metrics"""
+        stats = self.stats()
+        reports = stats['reports']
+        handler_utilization = stats['handlers_active'] / stats['handlers_max']
+        report_utilization = reports['running'] / reports['max_workers']
+
+        metrics.record_value('runtime.handler_utilization', handler_utilization * 100)
+        metrics.record_value('runtime.report_utilization', report_utilization * 100)
+        metrics.record_value('runtime.updates_queued', stats['updates_queued'])
+        metrics.record_value('runtime.updates_waiting', stats['updates_in_flight'] - stats['handlers_active'])
+        metrics.record_value('runtime.reports_waiting', reports['waiting'])
+
+        update_queue_max = stats['update_queue_max'] or 'unbounded'
+        logger.info(
+            f"Pool utilization: handlers {stats['handlers_active']}/{stats['handlers_max']} "
+            f"({handler_utilization:.0%}), updates waiting for their chat or a slot "
+            f"{stats['updates_in_flight'] - stats['handlers_active']}, "
+            f"updates queued {stats['updates_queued']}/{update_queue_max}, "
+            f"reports {reports['running']}/{reports['max_workers']} ({report_utilization:.0%}) "
+            f"with {reports['waiting']}/{reports['max_pending']} waiting"
+        )
+
+    async def _run(self):
+        """Record utilization every interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.record()
+            except Exception as e:
+                logger.error(f"Error recording pool utilization: {e}", exc_info=True)
+
+    def start(self):
+        """Start reporting on the running event loop (no-op if the interval is 0)"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="pool-monitor")
+
+    async def stop(self):
+        """Stop reporting, recording the final state once more"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.record()
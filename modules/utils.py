@@ -6,7 +6,9 @@ Utility functions for the Values Report Bot
 """
 
 import re
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
@@ -118,4 +120,18 @@ def format_values_for_display(values_list):
     if not values_list:
         return "None"
     
-    return ", ".join(values_list)
\ No newline at end of file
+    return ", ".join(values_list)
+
+def configure_blocking_io(max_threads):
+    """
+    Size the running event loop's default executor for blocking I/O
+    
+    Storage calls (and Gemini calls over the REST transport) are run with
+    asyncio.to_thread, which uses this executor. The asyncio default is
+    sized from the CPU count, which is far too small on a one-CPU instance.
+    
+    Args:
+        max_threads (int): Maximum number of threads doing blocking I/O
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="blocking-io"))
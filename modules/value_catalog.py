@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Value catalog for the Values Report Bot
+
+Indexes Config.VALUES_LIST once at import so that looking up a value typed by
+a user does not scan the list. Exact names and the individual parts of
+compound values (e.g. "Teamwork" and "Collaboration" for
+"Teamwork; Collaboration") are resolved with a dict lookup; partial and fuzzy
+matches use a prebuilt character n-gram index.
+"""
+
+import logging
+from dataclasses import dataclass
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Minimum n-gram similarity for a fuzzy match (e.g. a misspelt value)
+FUZZY_MATCH_THRESHOLD = 0.5
+
+# Longest n-gram stored in the index
+MAX_NGRAM = 3
+
+@dataclass(frozen=True)
+class ValueMatch:
+    """Result of looking up a value in the catalog"""
+    value: str
+    description: str
+    schwartz_category: str
+    gouveia_category: str
+    match_type: str  # exact, alias, partial or fuzzy
+    confidence: float
+
+def normalize_value_name(name):
+    """Lowercase a value name and collapse its whitespace"""
+    return " ".join(name.lower().split())
+
+def _ngrams(text, n):
+    """Return the set of character n-grams of text"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+class ValueCatalog:
+    """Indexed, read-only view over a list of value definitions"""
+
+    def __init__(self, values_list):
+        """
+        Args:
+            values_list (list): Value definitions in the format of Config.VALUES_LIST
+        """
+        self._entries = list(values_list)
+        self._names = [normalize_value_name(entry["value"]) for entry in self._entries]
+        self._exact = {}
+        self._aliases = {}
+        self._ngram_index = {n: {} for n in range(1, MAX_NGRAM + 1)}
+        self._trigram_counts = [len(_ngrams(name, MAX_NGRAM)) for name in self._names]
+
+        for index, name in enumerate(self._names):
+            self._exact.setdefault(name, index)
+            for part in name.split(";"):
+                part = part.strip()
+                if part and part != name:
+                    self._aliases.setdefault(part, index)
+            for n in self._ngram_index:
+                for gram in _ngrams(name, n):
+                    self._ngram_index[n].setdefault(gram, set()).add(index)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def match(self, value_name):
+        """
+        Find the catalog entry for a value name
+
+        Exact names are tried first, then the parts of compound values, then
+        entries containing (or contained in) the name, and finally the most
+        similar entry by trigram overlap.
+
+        Args:
+            value_name (str): Value name as typed by the user
+
+        Returns:
+            ValueMatch: Matching entry, or None if nothing matches
+        """
+        name = normalize_value_name(value_name)
+        if not name:
+            return None
+
+        if name in self._exact:
+            return self._build_match(self._exact[name], "exact", 1.0)
+
+        if name in self._aliases:
+            return self._build_match(self._aliases[name], "alias", 1.0)
+
+        index = self._partial_match(name)
+        if index is not None:
+            shorter, longer = sorted((len(name), len(self._names[index])))
+            return self._build_match(index, "partial", round(shorter / longer, 2))
+
+        index, score = self._fuzzy_match(name)
+        if index is not None:
+            return self._build_match(index, "fuzzy", round(score, 2))
+
+        return None
+
+    def _partial_match(self, name):
+        """Return the first entry containing name, or contained in it"""
+        n = min(len(name), MAX_NGRAM)
+        index = self._ngram_index[n]
+
+        # Entries containing the name must contain all of its n-grams
+        postings = [index.get(gram, set()) for gram in _ngrams(name, n)]
+        candidates = set.intersection(*postings) if postings else set()
+
+        # Entries contained in the name share at least one trigram with it
+        for gram in _ngrams(name, MAX_NGRAM):
+            candidates |= self._ngram_index[MAX_NGRAM].get(gram, set())
+
+        for candidate in sorted(candidates):
+            entry_name = self._names[candidate]
+            if name in entry_name or entry_name in name:
+                return candidate
+        return None
+
+    def _fuzzy_match(self, name):
+        """Return the entry with the highest trigram similarity to name"""
+        grams = _ngrams(name, MAX_NGRAM)
+        if not grams:
+            return None, 0.0
+
+        shared = {}
+        for gram in grams:
+            for candidate in self._ngram_index[MAX_NGRAM].get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        best_index, best_score = None, 0.0
+        for candidate, count in sorted(shared.items()):
+            score = count / (len(grams) + self._trigram_counts[candidate] - count)
+            if score > best_score:
+                best_index, best_score = candidate, score
+
+        if best_score < FUZZY_MATCH_THRESHOLD:
+            return None, 0.0
+        return best_index, best_score
+
+    def _build_match(self, index, match_type, confidence):
+        """Create a ValueMatch for the entry at index"""
+        entry = self._entries[index]
+        return ValueMatch(
+            value=entry["value"],
+            description=entry["description"],
+            schwartz_category=entry["schwartz_category"],
+            gouveia_category=entry["gouveia_category"],
+            match_type=match_type,
+            confidence=confidence
+        )
+
+# Catalog of the predetermined values, built once at import
+value_catalog = ValueCatalog(Config.VALUES_LIST)
+
+# Number of values in a complete profile (5 ranked + 5 unranked)
+PROFILE_SIZE = 10
+
+def resolve_profile(user_data):
+    """
+    Resolve the user's ten values against the catalog
+    
+    The result is computed once when the user confirms their inputs and is
+    then shared by the prompts, the report renderer and storage.
+    
+    Args:
+        user_data (dict): User's values and personal information
+        
+    Returns:
+        list: PROFILE_SIZE dicts with value (as entered), matched_value,
+              description, schwartz_category, gouveia_category, match_type
+              and confidence, padded with "Unknown" entries
+    """
+    values = user_data.get('top_values', [])[:5] + user_data.get('next_values', [])[:5]
+    values += ["Unknown"] * (PROFILE_SIZE - len(values))
+    
+    profile = []
+    for value in values:
+        match = value_catalog.match(value)
+        profile.append({
+            'value': value,
+            'matched_value': match.value if match else None,
+            'description': match.description if match else "No description available",
+            'schwartz_category': match.schwartz_category if match else "Unknown",
+            'gouveia_category': match.gouveia_category if match else "Unknown",
+            'match_type': match.match_type if match else None,
+            'confidence': match.confidence if match else 0.0
+        })
+    
+    return profile
+
+def get_value_profile(user_data):
+    """Return the resolved profile stored in user_data, resolving it if missing"""
+    return user_data.get('value_profile') or resolve_profile(user_data)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Write-behind persistence for the Values Report Bot
+
+User, report and session writes are queued in memory and committed to
+Firestore by a background thread as WriteBatches of up to 500 writes, when
+enough have built up or the oldest has waited FLUSH_INTERVAL seconds, so
+storing a report no longer delays its delivery.
+
+Each write is appended to an on-disk journal (and fsynced) before it is
+accepted, and a marker is appended once its batch commits. On startup any
+writes without a marker are queued again, so a crash loses nothing that was
+accepted. All writes are set() calls on documents with known IDs, which
+makes replaying a write that did commit before the crash harmless. The
+queue is bounded; when it is full, callers wait for the next flush. Failed
+commits stay queued and are retried with backoff.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from firebase_admin import firestore
+from google.cloud.firestore_v1.document import DocumentReference
+from modules import metrics
+
+logger = logging.getLogger(__name__)
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+# Marks values that are not plain JSON in the journal
+_TAG = '__write_behind__'
+
+def _encode(value):
+    """Make a document value JSON-serialisable for the journal"""
+    if value is firestore.SERVER_TIMESTAMP:
+        return {_TAG: 'server_timestamp'}
+    if isinstance(value, DocumentReference):
+        return {_TAG: 'ref', 'path': value.path}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+def _decode(db, value):
+    """Turn a journal value back into a document value"""
+    if isinstance(value, dict):
+        tag = value.get(_TAG)
+        if tag == 'server_timestamp':
+            return firestore.SERVER_TIMESTAMP
+        if tag == 'ref':
+            return db.document(value['path'])
+        return {key: _decode(db, item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(db, item) for item in value]
+    return value
+
+class WriteBehindQueue:
+    """Bounded, journaled queue of Firestore writes committed in batches by a background thread"""
+
+    def __init__(self, db, journal_path, max_pending=5000, batch_size=MAX_BATCH_WRITES,
+                 flush_interval=2.0, max_retry_delay=60.0):
+        """
+        Args:
+            db (firestore.Client): Firestore client
+            journal_path (str): File recording writes until they are committed
+            max_pending (int): Writes queued before callers have to wait
+            batch_size (int): Writes per batch (at most 500)
+            flush_interval (float): Seconds a write may wait before its batch is committed
+            max_retry_delay (float): Upper bound on the wait between failed commits
+        """
+        self.db = db
+        self.journal_path = journal_path
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        self.flush_interval = flush_interval
+        self.max_retry_delay = max_retry_delay
+        self._pending = []
+        self._sequence = 0
+        self._journal = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._flushing = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        """Whether writes are being accepted and flushed"""
+        return self._thread is not None
+
+    def start(self):
+        """Queue writes left in the journal by a previous run and start flushing"""
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            recovered = self._read_journal()
+            self._pending = recovered
+            self._sequence = max((write['seq'] for write in recovered), default=0)
+            self._rewrite_journal()
+
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} uncommitted write(s) from {self.journal_path}")
+            metrics.increment('write_behind.recovered', len(recovered))
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def _read_journal(self):
+        """Load journaled writes that have no commit marker"""
+        if not os.path.exists(self.journal_path):
+            return []
+
+        writes, committed = {}, 0
+        with open(self.journal_path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append; it was never acknowledged
+                    continue
+                if 'committed' in entry:
+                    committed = max(committed, entry['committed'])
+                else:
+                    writes[entry['seq']] = entry
+        return [writes[seq] for seq in sorted(writes) if seq > committed]
+
+    def _rewrite_journal(self):
+        """Replace the journal with just the pending writes (caller holds the lock)"""
+        if self._journal is not None:
+            self._journal.close()
+        temporary_path = f"{self.journal_path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as journal:
+            for write in self._pending:
+                journal.write(json.dumps(write) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _append(self, entry):
+        """Append an entry to the journal and make it durable (caller holds the lock)"""
+        self._journal.write(json.dumps(entry) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def set(self, collection, document_id, data, merge=False):
+        """
+        Queue a set() of a document, waiting if the queue is full
+
+        Args:
+            collection (str): Collection name
+            document_id (str): Document ID (must be known up front)
+            data (dict): Document data; SERVER_TIMESTAMP and document references are allowed
+            merge (bool): Merge into an existing document instead of replacing it
+        """
+        with self._lock:
+            if self._journal is None:
+                raise RuntimeError("Write-behind queue is not running")
+            while len(self._pending) >= self.max_pending:
+                metrics.increment('write_behind.full_waits')
+                self._changed.notify_all()
+                self._changed.wait()
+
+            self._sequence += 1
+            write = {
+                'seq': self._sequence,
+                'collection': collection,
+                'document': document_id,
+                'data': _encode(data),
+                'merge': merge,
+                'queued_at': time.time()
+            }
+            self._append(write)
+            self._pending.append(write)
+            if len(self._pending) >= self.batch_size:
+                self._changed.notify_all()
+
+    def pending(self):
+        """Number of writes not yet committed"""
+        with self._lock:
+            return len(self._pending)
+
+    def _commit(self, writes):
+        """Commit writes to Firestore as one batch"""
+        batch = self.db.batch()
+        for write in writes:
+            ref = self.db.collection(write['collection']).document(write['document'])
+            batch.set(ref, _decode(self.db, write['data']), merge=write['merge'])
+        with metrics.timed('write_behind.commit'):
+            batch.commit()
+
+    def _due(self):
+        """Whether a batch should be committed now (caller holds the lock)"""
+        return len(self._pending) >= self.batch_size or (
+            self._pending and self._pending[0]['queued_at'] + self.flush_interval <= time.time()
+        )
+
+    def flush(self, only_due=False):
+        """
+        Commit queued writes, one batch at a time
+
+        Args:
+            only_due (bool): Stop once no full batch or overdue write is left,
+                             instead of committing everything
+
+        Returns:
+            bool: True unless a commit failed
+        """
+        with self._flushing:
+            while True:
+                with self._lock:
+                    if only_due and not self._due():
+                        return True
+                    writes = self._pending[:self.batch_size]
+                if not writes:
+                    return True
+
+                try:
+                    self._commit(writes)
+                except Exception as e:
+                    metrics.increment('write_behind.failures')
+                    logger.error(f"Error committing {len(writes)} queued write(s): {e}")
+                    return False
+
+                metrics.increment('write_behind.batches')
+                metrics.record_value('write_behind.batch_size', len(writes))
+                metrics.record_timing('write_behind.delay', time.time() - writes[0]['queued_at'])
+                with self._lock:
+                    del self._pending[:len(writes)]
+                    if self._pending:
+                        self._append({'committed': writes[-1]['seq']})
+                    else:
+                        self._rewrite_journal()
+                    self._changed.notify_all()
+
+    def _run(self):
+        """Flush when a batch fills up or the oldest write is due, backing off after failures"""
+        retry_delay = 1.0
+        while True:
+            with self._lock:
+                while not self._stopping and not self._due():
+                    wait = self._pending[0]['queued_at'] + self.flush_interval - time.time() if self._pending else None
+                    self._changed.wait(wait)
+                if self._stopping:
+                    return
+
+            if self.flush(only_due=True):
+                retry_delay = 1.0
+            else:
+                with self._lock:
+                    self._changed.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, self.max_retry_delay)
+
+    def shutdown(self):
+        """
+        Stop the background thread and commit whatever is still queued
+
+        Returns:
+            bool: True if nothing is left uncommitted (anything left stays in the journal)
+        """
+        with self._lock:
+            self._stopping = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        flushed = self.flush()
+        with self._lock:
+            left = len(self._pending)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        if left:
+            logger.warning(f"{left} write(s) not committed; they will be retried from the journal on the next start")
+        return flushed
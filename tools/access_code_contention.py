@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Concurrency test for access code redemption against the Firestore emulator
+
+Creates an access code with a fixed number of uses, then has many users
+redeem it at once through several simulated bot instances (each with its
+own AccessCodeRedeemer, as separate processes would have). Checks that
+exactly the available uses were handed out and that the stored count never
+went below zero, and prints how long redemptions took.
+
+    gcloud emulators firestore start --host-port=localhost:8086 &
+    FIRESTORE_EMULATOR_HOST=localhost:8086 python tools/access_code_contention.py \\
+        --uses 250 --attempts 300 --instances 4 --lease 10
+
+Only runs against the emulator; it refuses to run without
+FIRESTORE_EMULATOR_HOST set.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import firestore
+from modules.access_codes import AccessCodeRedeemer, access_code_ref
+from modules import metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Redeem one access code from many users at once")
+    parser.add_argument('--uses', type=int, default=250, help="Uses the code starts with")
+    parser.add_argument('--attempts', type=int, default=300, help="Users redeeming the code")
+    parser.add_argument('--instances', type=int, default=4, help="Simulated bot instances")
+    parser.add_argument('--lease', type=int, default=0, help="Uses claimed per transaction (0 for none)")
+    parser.add_argument('--threads', type=int, default=64, help="Redemptions running at the same time")
+    parser.add_argument('--project', default='demo-values-report', help="Emulator project ID")
+    args = parser.parse_args()
+
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        print("FIRESTORE_EMULATOR_HOST is not set; this test only runs against the emulator")
+        return 1
+
+    db = firestore.Client(project=args.project)
+    code = f"CONTENTION{os.getpid()}"
+    access_code_ref(db, code).set({'code': code, 'remaining_uses': args.uses})
+
+    redeemers = [AccessCodeRedeemer(db, lease_size=args.lease) for _ in range(args.instances)]
+
+    def attempt(index):
+        start = time.perf_counter()
+        redeemed, _ = redeemers[index % len(redeemers)].redeem(code)
+        return redeemed, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(attempt, range(args.attempts)))
+    elapsed = time.perf_counter() - start
+
+    released = sum(redeemer.release_leases() for redeemer in redeemers)
+    stored = access_code_ref(db, code).get().to_dict()['remaining_uses']
+
+    redeemed = sum(1 for success, _ in results if success)
+    durations = sorted(duration for _, duration in results)
+    expected = min(args.uses, args.attempts)
+    counters = metrics.snapshot()['counters']
+
+    print(f"Redeemed {redeemed} of {args.uses} uses with {args.attempts} attempts in {elapsed:.2f}s")
+    print(
+        f"Latency: median {durations[len(durations) // 2] * 1000:.1f}ms, "
+        f"p99 {durations[int(len(durations) * 0.99)] * 1000:.1f}ms, max {durations[-1] * 1000:.1f}ms"
+    )
+    print(
+        f"Firestore transactions: {counters.get('access_codes.claims', 0)}, "
+        f"lease hits: {counters.get('access_codes.lease_hits', 0)}, leased uses returned: {released}"
+    )
+    print(f"Stored remaining_uses: {stored} (expected {args.uses - redeemed})")
+
+    if redeemed > args.uses or stored != args.uses - redeemed or stored < 0:
+        print("FAIL: code was over-redeemed or its count is inconsistent")
+        return 1
+    if args.lease == 0 and redeemed != expected:
+        print(f"FAIL: expected {expected} redemptions")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
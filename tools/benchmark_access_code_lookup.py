@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark access code lookups on the Firestore emulator
+
+Seeds two scratch collections with the same codes, one the old way (auto
+IDs, looked up with a where-query on the code field) and one keyed by code
+(looked up with a direct document get), then times random lookups against
+each and prints the latencies side by side.
+
+    gcloud emulators firestore start --host-port=localhost:8086 &
+    FIRESTORE_EMULATOR_HOST=localhost:8086 python tools/benchmark_access_code_lookup.py --codes 2000 --lookups 500
+
+Only runs against the emulator; it refuses to run without
+FIRESTORE_EMULATOR_HOST set.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from google.cloud import firestore
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+def seed(db, collection, codes, keyed):
+    """Write the codes to a collection in batches, keyed by code or by auto ID"""
+    ref = db.collection(collection)
+    for start in range(0, len(codes), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for code in codes[start:start + MAX_BATCH_WRITES]:
+            batch.set(ref.document(code) if keyed else ref.document(), {'code': code, 'remaining_uses': 5})
+        batch.commit()
+
+def time_lookups(label, lookup, codes):
+    """Run lookups one after another and print their latency"""
+    durations = []
+    for code in codes:
+        start = time.perf_counter()
+        if not lookup(code):
+            raise RuntimeError(f"{label}: code {code} not found")
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    print(
+        f"{label}: {len(durations)} lookups, median {durations[len(durations) // 2] * 1000:.2f}ms, "
+        f"p99 {durations[int(len(durations) * 0.99)] * 1000:.2f}ms, "
+        f"total {sum(durations):.2f}s"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare where-query and document ID access code lookups")
+    parser.add_argument('--codes', type=int, default=2000, help="Codes in each collection")
+    parser.add_argument('--lookups', type=int, default=500, help="Lookups per method")
+    parser.add_argument('--project', default='demo-values-report', help="Emulator project ID")
+    args = parser.parse_args()
+
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        print("FIRESTORE_EMULATOR_HOST is not set; this benchmark only runs against the emulator")
+        return 1
+
+    db = firestore.Client(project=args.project)
+    suffix = os.getpid()
+    query_collection = f"bench_access_codes_query_{suffix}"
+    keyed_collection = f"bench_access_codes_keyed_{suffix}"
+    codes = [f"CODE{index:06d}" for index in range(args.codes)]
+
+    start = time.perf_counter()
+    seed(db, query_collection, codes, keyed=False)
+    seed(db, keyed_collection, codes, keyed=True)
+    print(f"Seeded {args.codes} codes per collection in {time.perf_counter() - start:.1f}s")
+
+    sample = random.choices(codes, k=args.lookups)
+    time_lookups(
+        "where-query",
+        lambda code: db.collection(query_collection).where('code', '==', code).limit(1).get(),
+        sample
+    )
+    time_lookups(
+        "document ID",
+        lambda code: db.collection(keyed_collection).document(code).get().exists,
+        sample
+    )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
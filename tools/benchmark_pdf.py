@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark for HTML and PDF report rendering
+
+Renders the same report repeatedly, first as HTML only and then as PDF
+through the pre-warmed worker pool, and prints the throughput of each. LLM
+calls are not involved; the sections use canned markdown.
+
+    python tools/benchmark_pdf.py --reports 40 --concurrency 4 --workers 2
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from modules.report_generator import generate_report, preload_assets
+from modules.pdf_renderer import get_pdf_renderer
+
+SAMPLE_USER = {
+    'top_values': ['Family', 'Honesty', 'Curiosity', 'Resilience', 'Creativity'],
+    'next_values': ['Balance', 'Fun', 'Service', 'Autonomy', 'Mastery'],
+    'age': 30,
+    'country': 'Singapore',
+    'occupation': 'Engineer'
+}
+
+SAMPLE_SECTION = (
+    "Your values shape how you **decide**, **relate** and **grow**.\n\n"
+    "- Family and honesty anchor your commitments\n"
+    "- Curiosity and creativity pull you towards new experiences\n\n"
+) * 8
+
+def run(label, reports, concurrency, output_format):
+    """Render reports concurrently and print throughput and latency"""
+    sections = {section['title']: SAMPLE_SECTION for section in Config.REPORT_SECTIONS}
+
+    def render_one(_):
+        start = time.perf_counter()
+        success, report = generate_report(SAMPLE_USER, sections, output_format=output_format)
+        if not success:
+            raise RuntimeError(report)
+        with report:
+            size = len(report.read())
+        return time.perf_counter() - start, size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(render_one, range(reports)))
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(result[0] for result in results)
+    print(
+        f"{label}: {reports} reports in {elapsed:.2f}s "
+        f"({reports / elapsed:.1f} reports/s), "
+        f"median {durations[len(durations) // 2] * 1000:.0f}ms, "
+        f"max {durations[-1] * 1000:.0f}ms, "
+        f"{results[0][1]} bytes each"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML and PDF report rendering")
+    parser.add_argument('--reports', type=int, default=20, help="Reports rendered per mode")
+    parser.add_argument('--concurrency', type=int, default=4, help="Reports rendered at the same time")
+    parser.add_argument('--workers', type=int, default=Config.PDF_WORKERS, help="PDF worker processes")
+    args = parser.parse_args()
+
+    Config.PDF_WORKERS = args.workers
+    preload_assets()
+    run("HTML", args.reports, args.concurrency, 'html')
+
+    renderer = get_pdf_renderer()
+    start = time.perf_counter()
+    renderer.start()
+    print(f"PDF pool warm-up: {time.perf_counter() - start:.2f}s for {args.workers} workers")
+    try:
+        run("PDF", args.reports, args.concurrency, 'pdf')
+    finally:
+        renderer.shutdown()
+
+if __name__ == '__main__':
+    main()
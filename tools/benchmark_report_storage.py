@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark Firestore round-trips per report on the emulator
+
+Stores the user profile and report of many simulated users, first the way
+older versions did (a where-query on telegram_id before every user write and
+again before writing the session) and then through the database module,
+which keys users by Telegram ID. Counts the Firestore RPCs each way and
+prints round-trips and latency per report.
+
+    gcloud emulators firestore start --host-port=localhost:8086 &
+    FIRESTORE_EMULATOR_HOST=localhost:8086 python tools/benchmark_report_storage.py --users 200
+
+Only runs against the emulator; it refuses to run without
+FIRESTORE_EMULATOR_HOST set.
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.cloud import firestore
+from modules import database
+
+SAMPLE_USER = {
+    'telegram_username': 'benchmark',
+    'access_code': 'BENCH',
+    'top_values': ['Family', 'Honesty', 'Curiosity', 'Resilience', 'Creativity'],
+    'next_values': ['Balance', 'Fun', 'Service', 'Autonomy', 'Mastery'],
+    'age': 30,
+    'country': 'Singapore',
+    'occupation': 'Engineer'
+}
+
+SAMPLE_REPORT = {
+    'sections_content': {'Introduction': 'Sample section text. ' * 50},
+    'prompts_used': {'Introduction': 'Sample prompt. ' * 20}
+}
+
+class CountingAPI:
+    """Wraps the Firestore GAPIC client, counting the RPCs made through it"""
+
+    def __init__(self, api):
+        self._api = api
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._api, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+def legacy_store(db, user_id):
+    """Store a user and report the way older versions did"""
+    users_ref = db.collection('users')
+    storage_data = dict(SAMPLE_USER, telegram_id=user_id, updated_at=firestore.SERVER_TIMESTAMP)
+    results = users_ref.where('telegram_id', '==', user_id).limit(1).get()
+    if results:
+        users_ref.document(results[0].id).update(storage_data)
+    else:
+        users_ref.add(storage_data)
+
+    report_ref = db.collection('reports').add(dict(SAMPLE_REPORT, telegram_id=user_id))[1]
+    results = users_ref.where('telegram_id', '==', user_id).limit(1).get()
+    if results:
+        user_data = results[0].to_dict()
+        db.collection('user_sessions').add({
+            'user_id': results[0].id,
+            'telegram_id': user_id,
+            'access_code': user_data.get('access_code'),
+            'report_ref': report_ref
+        })
+
+def current_store(db, user_id):
+    """Store a user and report through the database module"""
+    database.store_user_data(user_id, SAMPLE_USER)
+    database.store_report(user_id, SAMPLE_REPORT, SAMPLE_USER)
+
+def run(label, store, db, api, user_ids):
+    """Store every user's data and print RPCs and latency per report"""
+    api.calls.clear()
+    durations = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        store(db, user_id)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    rpcs = sum(api.calls.values())
+    breakdown = ', '.join(f"{name} {count / len(user_ids):.1f}" for name, count in sorted(api.calls.items()))
+    print(
+        f"{label}: {rpcs / len(user_ids):.1f} round-trips per report ({breakdown}); "
+        f"median {durations[len(durations) // 2] * 1000:.1f}ms, "
+        f"p99 {durations[int(len(durations) * 0.99)] * 1000:.1f}ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Count Firestore round-trips per stored report")
+    parser.add_argument('--users', type=int, default=200, help="Simulated users")
+    parser.add_argument('--project', default='demo-values-report', help="Emulator project ID")
+    args = parser.parse_args()
+
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        print("FIRESTORE_EMULATOR_HOST is not set; this benchmark only runs against the emulator")
+        return 1
+
+    db = firestore.Client(project=args.project)
+    api = CountingAPI(db._firestore_api)
+    db._firestore_api_internal = api
+    database.db = db
+
+    base = os.getpid() * 100000
+    run("where-query lookups", legacy_store, db, api, [base + index for index in range(args.users)])
+    run("keyed by Telegram ID", current_store, db, api, [base + args.users + index for index in range(args.users)])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Load test for the bot's conversation handlers
+
+Simulates N users going through the whole conversation at the same time,
+from /start to confirming their inputs, by calling the handlers directly
+with stand-in Telegram objects. Reports are then generated by the report
+queue as usual. Prints handler latencies and how long reports took to be
+delivered. Run it against tools/fake_llm_server.py:
+
+    python tools/fake_llm_server.py --latency 2 &
+    GEMINI_API_ENDPOINT=http://localhost:8089 GEMINI_API_KEY=fake \\
+        python tools/bot_load_test.py --users 200
+
+Uses in-memory storage and a temporary job store; it refuses to run when
+Firebase credentials are configured.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep load test jobs out of the real job store
+os.environ['JOB_STORE_BACKEND'] = 'sqlite'
+os.environ['JOB_STORE_PATH'] = os.path.join(tempfile.mkdtemp(prefix="bot-load-test-"), 'jobs.sqlite3')
+
+from telegram.ext import ConversationHandler
+from config import Config
+from modules import database
+from modules.database import add_access_code
+from modules.report_queue import report_queue
+from modules.report_generator import preload_assets
+from modules.utils import configure_blocking_io
+from modules import bot_handler
+
+_message_ids = itertools.count(1)
+
+class FakeBot:
+    """Records messages and documents instead of calling Telegram"""
+
+    def __init__(self):
+        self.delivered = {}
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        await asyncio.sleep(0)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0)
+
+    async def send_document(self, chat_id, document, filename=None, **kwargs):
+        self.delivered[chat_id] = (time.perf_counter(), len(document.read()))
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.username = f"load_test_{user_id}"
+
+class FakeMessage:
+    def __init__(self, chat_id, text=None):
+        self.chat_id = chat_id
+        self.message_id = next(_message_ids)
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        await asyncio.sleep(0)
+        return FakeMessage(self.chat_id)
+
+class FakeCallbackQuery:
+    def __init__(self, chat_id, data):
+        self.data = data
+        self.message = FakeMessage(chat_id)
+
+    async def answer(self, *args, **kwargs):
+        await asyncio.sleep(0)
+
+    async def edit_message_text(self, text, **kwargs):
+        await asyncio.sleep(0)
+
+class FakeUpdate:
+    def __init__(self, user_id, text=None, callback_data=None):
+        self.effective_user = FakeUser(user_id)
+        self.message = FakeMessage(user_id, text) if text is not None else None
+        self.callback_query = FakeCallbackQuery(user_id, callback_data) if callback_data else None
+
+class FakeContext:
+    def __init__(self, bot):
+        self.bot = bot
+        self.user_data = {}
+
+async def simulate_user(user_id, bot, access_code, latencies):
+    """Drive one user through the conversation, returning when their report is queued"""
+    context = FakeContext(bot)
+    steps = [
+        (bot_handler.start, FakeUpdate(user_id, "/start")),
+        (bot_handler.handle_access_code, FakeUpdate(user_id, access_code)),
+        (bot_handler.collect_top_five_values, FakeUpdate(user_id, "Family, Honesty, Curiosity, Resilience, Creativity")),
+        (bot_handler.collect_next_five_values, FakeUpdate(user_id, "Balance, Fun, Service, Autonomy, Mastery")),
+        (bot_handler.collect_age, FakeUpdate(user_id, "34")),
+        (bot_handler.collect_country, FakeUpdate(user_id, "Singapore")),
+        (bot_handler.collect_occupation, FakeUpdate(user_id, f"Engineer {user_id}")),
+        (bot_handler.confirm_inputs, FakeUpdate(user_id, callback_data="confirm")),
+    ]
+    for handler, update in steps:
+        start = time.perf_counter()
+        state = await handler(update, context)
+        latencies.append(time.perf_counter() - start)
+        if handler is bot_handler.handle_access_code and state == bot_handler.ACCESS_CODE:
+            raise RuntimeError(f"Access code rejected for user {user_id}")
+    return state == ConversationHandler.END
+
+async def run(users):
+    configure_blocking_io(Config.BLOCKING_IO_THREADS)
+    bot = FakeBot()
+    access_code = f"LOADTEST{os.getpid()}"
+    add_access_code(access_code, remaining_uses=users)
+
+    latencies = []
+    start = time.perf_counter()
+    queued = await asyncio.gather(*(simulate_user(1000 + i, bot, access_code, latencies) for i in range(users)))
+    conversations_done = time.perf_counter() - start
+
+    await report_queue.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    delivery_times = sorted(delivered_at - start for delivered_at, _ in bot.delivered.values())
+    print(f"Users: {users}, reports queued: {sum(queued)}, delivered: {len(bot.delivered)}")
+    print(f"All conversations finished in {conversations_done:.2f}s")
+    print(
+        f"Handler latency: median {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms, max {latencies[-1] * 1000:.1f}ms"
+    )
+    if delivery_times:
+        print(
+            f"Report delivery: first {delivery_times[0]:.1f}s, "
+            f"median {delivery_times[len(delivery_times) // 2]:.1f}s, last {delivery_times[-1]:.1f}s"
+        )
+    print(f"Total: {elapsed:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the bot's conversation handlers")
+    parser.add_argument('--users', type=int, default=50, help="Users going through the conversation at once")
+    args = parser.parse_args()
+
+    if database.db is not None:
+        print("Refusing to run with Firebase configured; unset its credentials to use memory storage")
+        return 1
+
+    preload_assets()
+    asyncio.run(run(args.users))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
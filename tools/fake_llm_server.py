@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fake Gemini API server for local testing
+
+Answers generateContent requests with canned text after a configurable delay,
+and fails a configurable share of them with 429 or 503 errors, so the LLM
+scheduler's rate limiting, retries and queueing can be exercised without
+calling (or paying for) the real API.
+
+Usage:
+    python tools/fake_llm_server.py --port 8089 --latency 2 --error-rate 0.3
+
+Then point the bot or tools/llm_burst_test.py at it:
+    GEMINI_API_ENDPOINT=http://localhost:8089 GEMINI_API_KEY=fake python app.py
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    """Handles POST /v1beta/models/<model>:generateContent and :streamGenerateContent"""
+
+    latency = 1.0
+    error_rate = 0.0
+    stats = {'requests': 0, 'errors': 0, 'in_flight': 0, 'max_in_flight': 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+        try:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+            if random.random() < self.error_rate:
+                with self.lock:
+                    self.stats['errors'] += 1
+                code, status = random.choice([(429, 'RESOURCE_EXHAUSTED'), (503, 'UNAVAILABLE')])
+                self._send_json(code, {'error': {'code': code, 'message': 'Fake error', 'status': status}})
+                return
+
+            prompt = ''
+            for content in body.get('contents', []):
+                for part in content.get('parts', []):
+                    prompt += part.get('text', '')
+
+            text = f"**Fake response** for a {len(prompt)}-character prompt.\n\n- First point\n- Second point"
+            if ':streamGenerateContent' in self.path:
+                # Streamed responses are a JSON array of partial responses
+                chunks = [text[i:i + 20] for i in range(0, len(text), 20)]
+                self._send_json(200, [self._candidate(chunk) for chunk in chunks])
+            else:
+                self._send_json(200, self._candidate(text))
+        finally:
+            with self.lock:
+                self.stats['in_flight'] -= 1
+
+    def log_message(self, format, *args):
+        """Keep the console quiet; stats are printed on exit"""
+
+    def _candidate(self, text):
+        return {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }]
+        }
+
+    def _send_json(self, code, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help="Average response time in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 429/503")
+    args = parser.parse_args()
+
+    FakeGeminiHandler.latency = args.latency
+    FakeGeminiHandler.error_rate = args.error_rate
+
+    server = ThreadingHTTPServer(('localhost', args.port), FakeGeminiHandler)
+    print(f"Fake Gemini server listening on http://localhost:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Stats: {FakeGeminiHandler.stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Burst test for the LLM scheduler
+
+Generates N reports' worth of sections at the same time, the way a workshop
+cohort confirming together would, and reports how many sections succeeded
+and how long reports took. Run it against tools/fake_llm_server.py:
+
+    python tools/fake_llm_server.py --error-rate 0.3 &
+    GEMINI_API_ENDPOINT=http://localhost:8089 GEMINI_API_KEY=fake \\
+        python tools/llm_burst_test.py --reports 50
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from modules.llm_integration import generate_all_sections, FAILED_SECTION_TEXT
+from modules.utils import configure_blocking_io
+from modules import metrics
+
+
+SAMPLE_USER = {
+    'top_values': ['Family', 'Honesty', 'Curiosity', 'Resilience', 'Creativity'],
+    'next_values': ['Balance', 'Fun', 'Service', 'Autonomy', 'Mastery'],
+    'age': 30,
+    'country': 'Singapore',
+    'occupation': 'Engineer'
+}
+
+async def run_report(index):
+    """Generate one report's sections, like a report queue task"""
+    user_data = dict(SAMPLE_USER, occupation=f"Engineer {index}")
+    start = time.perf_counter()
+    sections_content, _ = await generate_all_sections(user_data)
+    failed = sum(1 for content in sections_content.values() if content == FAILED_SECTION_TEXT)
+    return time.perf_counter() - start, len(sections_content), failed
+
+async def run_burst(reports):
+    """Start every report at the same time on one event loop"""
+    configure_blocking_io(Config.BLOCKING_IO_THREADS)
+    return await asyncio.gather(*(run_report(i) for i in range(reports)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst test for the LLM scheduler")
+    parser.add_argument('--reports', type=int, default=20, help="Reports started at the same time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = asyncio.run(run_burst(args.reports))
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(result[0] for result in results)
+    sections = sum(result[1] for result in results)
+    failed = sum(result[2] for result in results)
+
+    print(f"Reports: {len(results)} in {elapsed:.1f}s")
+    print(f"Sections: {sections - failed}/{sections} succeeded")
+    print(f"Report latency: median {durations[len(durations) // 2]:.1f}s, max {durations[-1]:.1f}s")
+    counters = metrics.snapshot()['counters']
+    print(f"Retries: {counters.get('llm_scheduler.retries', 0)}, "
+          f"exhausted: {counters.get('llm_scheduler.exhausted', 0)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Rekey the access_codes collection by code
+
+Older deployments stored access codes under auto-generated document IDs
+and looked them up with a where-query on the code field. The bot now reads
+each code directly from the document whose ID is the code. This tool copies
+every code that is not stored that way yet to its new document and deletes
+the old one, in write batches. When several documents hold the same code,
+their remaining uses are added together; if the code's new document already
+exists, the old documents' uses are added to it.
+
+Stop the bot (or pause access code redemptions) while it runs, since uses
+redeemed from an old document mid-migration would not be carried over.
+
+    python tools/migrate_access_codes.py --dry-run
+    python tools/migrate_access_codes.py
+
+Uses the same Firebase credentials as the bot.
+"""
+
+import os
+import sys
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import database
+from modules.access_codes import ACCESS_CODES_COLLECTION, is_valid_code
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+def plan_migration(db):
+    """
+    Find codes stored under IDs other than the code itself
+
+    Args:
+        db (firestore.Client): Firestore client
+
+    Returns:
+        tuple: ({code: [legacy DocumentSnapshot, ...]}, [invalid DocumentSnapshot, ...])
+    """
+    legacy = defaultdict(list)
+    invalid = []
+    for doc in db.collection(ACCESS_CODES_COLLECTION).stream():
+        code = (doc.to_dict() or {}).get('code')
+        if code == doc.id:
+            continue
+        if not is_valid_code(code):
+            invalid.append(doc)
+            continue
+        legacy[code].append(doc)
+    return legacy, invalid
+
+def migrate(db, legacy, dry_run=False):
+    """
+    Move legacy code documents to documents keyed by code, in batches
+
+    Args:
+        db (firestore.Client): Firestore client
+        legacy (dict): Output of plan_migration()
+        dry_run (bool): Print what would change without writing
+
+    Returns:
+        int: Codes migrated
+    """
+    collection = db.collection(ACCESS_CODES_COLLECTION)
+    batch, writes, migrated = db.batch(), 0, 0
+
+    for code, docs in sorted(legacy.items()):
+        target = collection.document(code)
+        existing = target.get()
+        uses = sum((doc.to_dict() or {}).get('remaining_uses', 0) for doc in docs)
+        data = dict(docs[0].to_dict())
+        if existing.exists:
+            data = existing.to_dict()
+            uses += data.get('remaining_uses', 0)
+        data.update(code=code, remaining_uses=uses)
+
+        print(f"{code}: {len(docs)} legacy document(s){' + existing' if existing.exists else ''} -> {uses} use(s)")
+        if dry_run:
+            continue
+
+        if writes + 1 + len(docs) > MAX_BATCH_WRITES:
+            batch.commit()
+            batch, writes = db.batch(), 0
+        batch.set(target, data)
+        for doc in docs:
+            batch.delete(doc.reference)
+        writes += 1 + len(docs)
+        migrated += 1
+
+    if writes and not dry_run:
+        batch.commit()
+    return migrated
+
+def main():
+    parser = argparse.ArgumentParser(description="Store access codes under the code as document ID")
+    parser.add_argument('--dry-run', action='store_true', help="Show the changes without writing them")
+    args = parser.parse_args()
+
+    db = database.db
+    if db is None and os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        from google.cloud import firestore as cloud_firestore
+        db = cloud_firestore.Client(project=os.environ.get('GCLOUD_PROJECT', 'demo-values-report'))
+    if db is None:
+        print("Firebase is not configured")
+        return 1
+
+    legacy, invalid = plan_migration(db)
+    for doc in invalid:
+        print(f"Skipping document {doc.id}: code {(doc.to_dict() or {}).get('code')!r} is not a valid document ID")
+    if not legacy:
+        print("All access codes are already keyed by code")
+        return 0
+
+    migrated = migrate(db, legacy, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Dry run: {len(legacy)} code(s) would be migrated")
+    else:
+        print(f"Migrated {migrated} code(s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Rekey the users collection by Telegram ID
+
+Older deployments stored users under auto-generated document IDs and found
+them with a where-query on telegram_id. The bot now writes each user to the
+document whose ID is their Telegram ID. This tool backfills those documents
+from the old ones and deletes the old ones, in write batches. If a user has
+several old documents (or already has a new one), their fields are merged
+with the most recently updated document winning. Session records are then
+repointed to their user's new document by their telegram_id field.
+
+Stop the bot first: the merged document replaces the new one, so a profile
+the bot saved between the read and the write would be overwritten. Safe to
+run again: users already keyed by Telegram ID are left alone, and sessions
+still pointing at an old document (e.g. after an interrupted run) are
+repointed on every run.
+
+    python tools/migrate_user_documents.py --dry-run
+    python tools/migrate_user_documents.py
+
+Uses the same Firebase credentials as the bot.
+"""
+
+import os
+import sys
+import argparse
+import datetime
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import database
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+class BatchWriter:
+    """Groups writes into batches, committing each one as it fills up"""
+
+    def __init__(self, db, dry_run=False):
+        self.db = db
+        self.dry_run = dry_run
+        self.writes = 0
+        self._batch = db.batch()
+        self._pending = 0
+
+    def _reserve(self, count):
+        if self._pending + count > MAX_BATCH_WRITES:
+            self.commit()
+        self._pending += count
+        self.writes += count
+
+    def set(self, ref, data):
+        self._reserve(1)
+        self._batch.set(ref, data)
+
+    def update(self, ref, data):
+        self._reserve(1)
+        self._batch.update(ref, data)
+
+    def delete(self, ref):
+        self._reserve(1)
+        self._batch.delete(ref)
+
+    def commit(self):
+        if self._pending and not self.dry_run:
+            self._batch.commit()
+        self._batch = self.db.batch()
+        self._pending = 0
+
+def _updated_at(snapshot):
+    """Sort key putting the most recently updated document last"""
+    data = snapshot.to_dict() or {}
+    value = data.get('updated_at') or data.get('created_at') or snapshot.update_time
+    return value or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Store users under their Telegram ID as document ID")
+    parser.add_argument('--dry-run', action='store_true', help="Show the changes without writing them")
+    args = parser.parse_args()
+
+    db = database.db
+    if db is None and os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        from google.cloud import firestore as cloud_firestore
+        db = cloud_firestore.Client(project=os.environ.get('GCLOUD_PROJECT', 'demo-values-report'))
+    if db is None:
+        print("Firebase is not configured")
+        return 1
+
+    users = db.collection('users')
+    legacy = defaultdict(list)
+    skipped = 0
+    for doc in users.stream():
+        telegram_id = (doc.to_dict() or {}).get('telegram_id')
+        if telegram_id is None:
+            skipped += 1
+        elif doc.id != str(telegram_id):
+            legacy[telegram_id].append(doc)
+
+    if skipped:
+        print(f"Skipping {skipped} user document(s) without a telegram_id")
+    if not legacy:
+        print("All users are already keyed by Telegram ID")
+
+    writer = BatchWriter(db, dry_run=args.dry_run)
+    for telegram_id, docs in legacy.items():
+        target = users.document(str(telegram_id))
+        existing = target.get()
+        snapshots = sorted(docs + ([existing] if existing.exists else []), key=_updated_at)
+        merged = {}
+        for snapshot in snapshots:
+            merged.update(snapshot.to_dict() or {})
+
+        writer.set(target, merged)
+        for doc in docs:
+            writer.delete(doc.reference)
+        print(f"{telegram_id}: merged {len(docs)} old document(s){' into existing' if existing.exists else ''}")
+
+    # Repoint session records at the new user documents, including any left
+    # behind by an earlier run that was interrupted
+    sessions = 0
+    for session in db.collection('user_sessions').stream():
+        data = session.to_dict() or {}
+        telegram_id = data.get('telegram_id')
+        if telegram_id is not None and data.get('user_id') != str(telegram_id):
+            writer.update(session.reference, {'user_id': str(telegram_id)})
+            sessions += 1
+    writer.commit()
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {len(legacy)} user(s) and {sessions} session(s) in {writer.writes} write(s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())